@@ -0,0 +1,41 @@
+"""Compares cost of number backends with float on the same expressions
+
+Run from the repository root: python -m benchmarks.backends
+"""
+from timeit import repeat
+from calc.backends import BACKENDS, get_backend
+from calc.calc import normalize
+
+EXPRESSIONS = [
+    '1+2*3-4/5',
+    '0.1+0.2*0.3',
+    '2^64/3',
+    'sqrt(2)*sqrt(3)',
+    'sin(pi/6)+cos(pi/3)',
+    'log(e^2)+abs(-7/3)',
+    '(((1.5+2.5)*3.5-4.5)/5.5)^2',
+]
+
+
+def bench(number=2000, repeats=5):
+    """Returns best per-expression compile and evaluation times in microseconds per backend"""
+    report = {}
+    for name in BACKENDS:
+        backend = get_backend(name)
+        normalized = [normalize(formula) for formula in EXPRESSIONS]
+        codes = [backend.compile(formula) for formula in normalized]
+        compile_time = min(repeat(lambda: [backend.compile(formula) for formula in normalized],
+                                  number=number // 10, repeat=repeats)) / (number // 10) / len(EXPRESSIONS)
+        eval_time = min(repeat(lambda: [backend.run(code) for code in codes],
+                               number=number, repeat=repeats)) / number / len(EXPRESSIONS)
+        report[name] = (compile_time * 1e6, eval_time * 1e6)
+    return report
+
+
+if __name__ == '__main__':
+    report = bench()
+    base_compile, base_eval = report['float']
+    print(f"{'backend':<10}{'compile, us':>14}{'x float':>9}{'evaluate, us':>15}{'x float':>9}")
+    for name, (compile_time, eval_time) in report.items():
+        print(f"{name:<10}{compile_time:>14.2f}{compile_time / base_compile:>9.1f}"
+              f"{eval_time:>15.3f}{eval_time / base_eval:>9.1f}")
@@ -0,0 +1,72 @@
+"""Representative inputs of the calc and equation engines, generated from fixed seed"""
+import random
+
+SEED = 2020
+
+
+def arithmetic(count, seed=SEED):
+    rnd = random.Random(seed)
+    formulas = []
+    for _ in range(count):
+        terms = [f"{rnd.uniform(0, 1000):.{rnd.randint(0, 3)}f}" for _ in range(rnd.randint(2, 8))]
+        formula = terms[0]
+        for term in terms[1:]:
+            formula += rnd.choice('+-*/') + term
+        formulas.append(formula)
+    return formulas
+
+
+def trig(count, seed=SEED):
+    rnd = random.Random(seed)
+    funcs = ['sin', 'cos', 'sqrt', 'log', 'abs']
+    formulas = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rnd.randint(2, 5)):
+            func = rnd.choice(funcs)
+            parts.append(f"{func}({rnd.uniform(0.1, 10):.3f}*pi/{rnd.randint(1, 12)})")
+        formulas.append(rnd.choice(['+', '*', '-']).join(parts))
+    return formulas
+
+
+def base_conversion(count, seed=SEED):
+    """Integer formulas with bin and hex literals, evaluated with bin/hex output"""
+    rnd = random.Random(seed)
+    formulas = []
+    for _ in range(count):
+        literals = [rnd.choice([bin, hex])(rnd.randint(0, 2 ** 32)) for _ in range(rnd.randint(2, 6))]
+        formula = literals[0]
+        for literal in literals[1:]:
+            op = rnd.choice(['|', '&', '+', '-', '<<', '>>', '*'])
+            # every step is parenthesized, shifts bind weaker than + and * and shifting
+            # by a sum of 32-bit literals would make huge integers
+            formula = f"({formula}{op}{rnd.randint(1, 16) if op in ('<<', '>>') else literal})"
+        formulas.append(formula)
+    return formulas
+
+
+def deep_nesting(count, seed=SEED, depth=40):
+    rnd = random.Random(seed)
+    formulas = []
+    for _ in range(count):
+        formula = str(rnd.randint(1, 9))
+        for _ in range(rnd.randint(depth // 2, depth)):
+            formula = f"({formula}{rnd.choice('+-*')}{rnd.randint(1, 9)})"
+        formulas.append(formula)
+    return formulas
+
+
+def polynomial_equations(count, seed=SEED):
+    rnd = random.Random(seed)
+    equations = []
+    for _ in range(count):
+        degree = rnd.randint(2, 6)
+        terms = [f"{rnd.randint(-9, 9)}*x^{power}" for power in range(degree, 0, -1)]
+        equations.append('+'.join(terms) + f"+{rnd.randint(-9, 9)}")
+    return equations
+
+
+def transcendental_equations(count, seed=SEED):
+    rnd = random.Random(seed)
+    templates = ['sin(x)-{a}*x', 'cos(x)-x/{b}', 'exp(x)-{b}*x', 'x*sin(x)-{a}', 'log(x+{b})-{a}']
+    return [rnd.choice(templates).format(a=rnd.randint(1, 5) / 10, b=rnd.randint(2, 9)) for _ in range(count)]
@@ -0,0 +1,37 @@
+"""Compares numeric and symbolic solving of differential equations
+
+Run from the repository root: python -m benchmarks.ode
+"""
+import time
+from calc import ode
+
+EQUATIONS = {
+    'decay': "y' + 2*y; y(0) = 1",
+    'logistic': "y' = y*(1 - y); y(0) = 0.5",
+    'oscillator': "y'' + y; y(0) = 1; y'(0) = 0",
+    'damped oscillator': "y'' + 0.5*y' + 4*y; y(0) = 1; y'(0) = 0",
+    'forced': "y'' + y = sin(2*x); y(0) = 0; y'(0) = 1",
+    'system': "y' - z; z' + y; y(0) = 1; z(0) = 0",
+    'airy': "y'' - x*y; y(0) = 1; y'(0) = 0",
+    'van der pol': "y'' - (1 - y**2)*y' + y; y(0) = 2; y'(0) = 0",
+}
+
+
+def timed(func, text, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        try:
+            func(text)
+        except Exception as error:
+            return f"{type(error).__name__}"
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return f"{best * 1000:.1f} ms"
+
+
+if __name__ == '__main__':
+    ode.solve_symbolic(EQUATIONS['decay'])  # sympy import is not measured
+    print(f"{'equation':<20}{'symbolic':>20}{'numeric':>20}")
+    for name, text in EQUATIONS.items():
+        print(f"{name:<20}{timed(ode.solve_symbolic, text, 3):>20}{timed(ode.solve_numeric, text, 3):>20}")
@@ -0,0 +1,191 @@
+"""Benchmark suite of the calc and equation engines
+
+    python -m benchmarks.run [--suite NAME ...] [--scale X] [--json FILE] [--compare FILE]
+                             [--threshold 0.1] [--profile] [--trace]
+
+Every suite reports throughput, p50/p99 latency and peak memory of traced allocations.
+Evaluation suites run twice: 'cold' with empty compiled formulas cache and 'warm'.
+Results written with --json can be compared with results of another commit by --compare,
+exit status is 1 if any suite got slower than threshold allows.
+"""
+import argparse
+import cProfile
+import json
+import platform
+import pstats
+import subprocess
+import sys
+import time
+import tracemalloc
+from benchmarks import corpora
+from calc import calc
+from calc.cache import LRUCache
+from calc.solve_cache import SolveCache
+
+
+def evaluate_dec(formula):
+    return calc.evaluate(formula, None)
+
+
+def evaluate_hex(formula):
+    return calc.evaluate(formula, hex)
+
+
+# name -> (corpus, number of items at scale 1, function, uses compiled formulas cache)
+SUITES = {
+    'arithmetic': (corpora.arithmetic, 5000, evaluate_dec, True),
+    'trig': (corpora.trig, 5000, evaluate_dec, True),
+    'base_conversion': (corpora.base_conversion, 5000, evaluate_hex, True),
+    'deep_nesting': (corpora.deep_nesting, 1000, evaluate_dec, True),
+    'polynomial_solve': (corpora.polynomial_equations, 20, calc.solve_equation, False),
+    'transcendental_solve': (corpora.transcendental_equations, 10, calc.solve_equation, False),
+    'transcendental_numeric': (corpora.transcendental_equations, 50, calc.solve_numeric, False),
+}
+
+
+def measure(func, items):
+    latencies = []
+    errors = 0
+    clock = time.perf_counter_ns
+    start = clock()
+    for item in items:
+        begin = clock()
+        try:
+            func(item)
+        except Exception:
+            errors += 1
+        latencies.append(clock() - begin)
+    total = (clock() - start) / 1e9
+    latencies.sort()
+    return {
+        'count': len(items),
+        'errors': errors,
+        'total_s': round(total, 6),
+        'throughput_per_s': round(len(items) / total, 2) if total else None,
+        'p50_us': round(latencies[len(latencies) // 2] / 1000, 3),
+        'p99_us': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] / 1000, 3),
+    }
+
+
+def peak_memory(func, items):
+    """Peak of traced allocations in KiB, measured in separate pass because tracing is slow"""
+    tracemalloc.start()
+    try:
+        for item in items:
+            try:
+                func(item)
+            except Exception:
+                pass
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def run_suite(name, scale, trace):
+    corpus, count, func, cached = SUITES[name]
+    items = corpus(max(1, int(count * scale)))
+    phases = ['cold', 'warm'] if cached else ['cold']
+    results = {}
+    # warm phase means every formula is compiled already, so the cache holds the whole corpus
+    code_cache = calc._code_cache
+    calc._code_cache = LRUCache(max(len(items), code_cache.max_size))
+    try:
+        for phase in phases:
+            results[phase] = measure(func, items)
+        calc._code_cache.clear()
+        results['cold']['peak_kib'] = peak_memory(func, items)
+    finally:
+        calc._code_cache = code_cache
+    if trace:
+        tracemalloc.start()
+        calc._code_cache.clear()
+        for item in items:
+            try:
+                func(item)
+            except Exception:
+                pass
+        top = tracemalloc.take_snapshot().statistics('lineno')[:10]
+        tracemalloc.stop()
+        print(f"\n[{name}] top allocations")
+        for stat in top:
+            print(f"  {stat}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Prints changes against baseline, returns list of regressions"""
+    regressions = []
+    print(f"\n{'suite':<24}{'phase':<6}{'p50 ratio':>11}{'p99 ratio':>11}{'throughput ratio':>18}")
+    for name, phases in results.items():
+        for phase, metrics in phases.items():
+            old = baseline.get('results', {}).get(name, {}).get(phase)
+            if not old:
+                continue
+            p50 = metrics['p50_us'] / old['p50_us'] if old['p50_us'] else float('nan')
+            p99 = metrics['p99_us'] / old['p99_us'] if old['p99_us'] else float('nan')
+            throughput = metrics['throughput_per_s'] / old['throughput_per_s'] if old['throughput_per_s'] else 1
+            flag = ''
+            if p50 > 1 + threshold or throughput < 1 - threshold:
+                regressions.append((name, phase))
+                flag = '  REGRESSION'
+            print(f"{name:<24}{phase:<6}{p50:>11.2f}{p99:>11.2f}{throughput:>18.2f}{flag}")
+    return regressions
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    args_parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description='Benchmarks of calc engine.')
+    args_parser.add_argument('--suite', action='append', choices=SUITES, help="suite to run, all by default")
+    args_parser.add_argument('--scale', type=float, default=1.0, help="multiplier of corpus sizes")
+    args_parser.add_argument('--json', help="file to write results to")
+    args_parser.add_argument('--compare', help="results of earlier run to compare with")
+    args_parser.add_argument('--threshold', type=float, default=0.1, help="allowed relative slowdown")
+    args_parser.add_argument('--profile', action='store_true', help="print cProfile statistics of every suite")
+    args_parser.add_argument('--trace', action='store_true', help="print top tracemalloc allocations")
+    args = args_parser.parse_args(argv)
+
+    # solutions cache would turn repeated runs into lookups
+    calc._solve_cache = SolveCache(None, 0, 0)
+    calc.solve_equation('x')  # sympy import is not measured
+
+    results = {}
+    print(f"{'suite':<24}{'phase':<6}{'items':>7}{'errors':>7}{'items/s':>12}{'p50, us':>11}{'p99, us':>11}"
+          f"{'peak, KiB':>11}")
+    for name in args.suite or SUITES:
+        profiler = cProfile.Profile() if args.profile else None
+        if profiler:
+            profiler.enable()
+        results[name] = run_suite(name, args.scale, args.trace)
+        if profiler:
+            profiler.disable()
+        for phase, m in results[name].items():
+            print(f"{name:<24}{phase:<6}{m['count']:>7}{m['errors']:>7}{m['throughput_per_s']:>12.1f}"
+                  f"{m['p50_us']:>11.1f}{m['p99_us']:>11.1f}{m.get('peak_kib', ''):>11}")
+        if profiler:
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+
+    report = {
+        'meta': {'commit': commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+                 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'scale': args.scale},
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Startup time report of the GUI
+
+    python -m benchmarks.startup [--runs 5] [--top 20] [--json FILE] [--import MODULE]
+
+Runs 'python -X importtime main.py --startup-report' several times and reports time to
+the first paint of the window, total import time and the slowest imported packages.
+With --import only import of the module is measured, e.g. on a host without display.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr):
+    """Returns {module: (self us, cumulative us)} of -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def run_once(target):
+    """Starts fresh interpreter, returns (seconds to first paint or exit, import breakdown)"""
+    if target is None:
+        command = [sys.executable, '-X', 'importtime', 'main.py', '--startup-report']
+    else:
+        command = [sys.executable, '-X', 'importtime', '-c', f'import {target}']
+    start = time.time()
+    process = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    end = time.time()
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1] if process.stderr.strip() else "failed")
+    for line in process.stdout.splitlines():
+        if line.startswith('first_paint '):
+            end = float(line.split()[1])
+    return end - start, parse_importtime(process.stderr)
+
+
+def top_level(modules):
+    """Cumulative import time of top-level packages, nested imports are counted by their parents"""
+    packages = {}
+    for name, (_, cumulative) in modules.items():
+        package = name.split('.')[0]
+        packages[package] = max(packages.get(package, 0), cumulative)
+    return packages
+
+
+def main(argv=None):
+    args_parser = argparse.ArgumentParser(prog='python -m benchmarks.startup', description='Startup time report.')
+    args_parser.add_argument('--runs', type=int, default=5, help="number of launches, median is reported")
+    args_parser.add_argument('--top', type=int, default=20, help="number of slowest packages shown")
+    args_parser.add_argument('--json', help="file to write report to")
+    args_parser.add_argument('--import', dest='target', help="measure import of module instead of GUI launch")
+    args = args_parser.parse_args(argv)
+
+    times = []
+    totals = []
+    packages = {}
+    for _ in range(args.runs):
+        seconds, modules = run_once(args.target)
+        times.append(seconds)
+        totals.append(sum(self_us for self_us, _ in modules.values()))
+        for package, cumulative in top_level(modules).items():
+            packages.setdefault(package, []).append(cumulative)
+    medians = {package: statistics.median(values) for package, values in packages.items()}
+    total = statistics.median(totals)
+    heavy = [name for name in ('numpy', 'sympy', 'mpmath', 'multiprocessing') if name in medians]
+
+    what = 'first paint' if args.target is None else f'import {args.target}'
+    print(f"time to {what}: median {statistics.median(times) * 1000:.1f} ms, "
+          f"min {min(times) * 1000:.1f} ms over {args.runs} runs")
+    print(f"imports: {total / 1000:.1f} ms in {len(medians)} top-level packages")
+    print(f"heavy packages loaded: {', '.join(heavy) or 'none'}")
+    print(f"\n{'package':<32}{'cumulative, ms':>16}")
+    for package, value in sorted(medians.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{package:<32}{value / 1000:>16.2f}")
+
+    if args.json:
+        report = {'target': args.target or 'main.py', 'runs': times, 'median_s': statistics.median(times),
+                  'imports_total_us': total, 'imports_us': medians, 'heavy': heavy}
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
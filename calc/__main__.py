@@ -0,0 +1,63 @@
+"""Evaluates formulas without GUI, one formula per line
+
+    python -m calc [FILE ...] [--base dec|bin|hex] [--backend float|decimal|fraction|mpmath]
+    python -m calc FILE --output RESULTS [--jobs N]
+
+Formulas are read from files or stdin if no files are given, results are written
+to stdout line by line. Errors are written as 'error: <message>' on the line of
+the formula and make exit status 1. With --output one file of any size is memory-mapped
+and evaluated by N processes, see calc.stream.
+"""
+import argparse
+import sys
+from calc.backends import BACKENDS
+from calc.calc import iter_evaluate
+
+BASES = {'dec': None, 'bin': bin, 'hex': hex}
+
+
+def read_lines(paths):
+    """Yields formulas of all files lazily, '-' stands for stdin"""
+    for path in paths:
+        # lines end with \n only, the same as in calc.stream, so output line N is result of input line N
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='\n')
+        if stream is sys.stdin and hasattr(stream, 'reconfigure'):
+            stream.reconfigure(newline='\n')
+        try:
+            for line in stream:
+                yield line.strip()
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def main(argv=None):
+    args_parser = argparse.ArgumentParser(prog='python -m calc', description='Evaluates formulas line by line.')
+    args_parser.add_argument('files', nargs='*', default=['-'], help="files with formulas, stdin by default")
+    args_parser.add_argument('--base', choices=BASES, default='dec', help="output base")
+    args_parser.add_argument('--backend', choices=BACKENDS, help="number backend, config.ini value by default")
+    args_parser.add_argument('-o', '--output', help="file to write results to, input must be one file")
+    args_parser.add_argument('-j', '--jobs', type=int, help="processes evaluating --output, number of cores by default")
+    args = args_parser.parse_args(argv)
+
+    if args.output is not None:
+        if len(args.files) != 1 or args.files[0] == '-':
+            args_parser.error("--output needs exactly one input file")
+        from calc.stream import evaluate_file
+        _, errors = evaluate_file(args.files[0], args.output, BASES[args.base], args.backend, args.jobs)
+        return 1 if errors else 0
+
+    failed = False
+    out = sys.stdout
+    for result in iter_evaluate(read_lines(args.files), BASES[args.base], args.backend):
+        if result.error is None:
+            out.write(f"{result.value}\n")
+        else:
+            failed = True
+            out.write(f"error: {result.error}\n")
+    out.flush()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+import ast
+import math
+from decimal import Decimal, Context, localcontext
+from fractions import Fraction
+from calc.compiler import compile_expr, power, CompileError
+from calc.errors import BaseConversionError
+from config.config import conf
+
+BACKENDS = ('float', 'decimal', 'fraction', 'mpmath')
+
+
+class Backend:
+    """Number type used for evaluation of formulas
+    name - one of BACKENDS
+    number - converts float literals of formula, None keeps them as floats
+    names - functions and constants available in formulas
+    ops - overridden binary operators, int division and negative powers leave the backend type otherwise
+    """
+
+    def __init__(self, name, number=None, names=None, ops=None, context=None, digits=None):
+        self.name = name
+        self.number = number
+        self.names = names
+        self.ops = ops
+        self.context = context
+        self.digits = digits
+
+    def compile(self, formula, variables=(), memo=None):
+        """Compiles normalized formula, constants are folded with numbers of this backend"""
+        if self.context is None:
+            return compile_expr(formula, self.names, variables, self.number, self.ops, memo)
+        with localcontext(self.context):
+            return compile_expr(formula, self.names, variables, self.number, self.ops, memo)
+
+    def run(self, code, env=None):
+        """Evaluates compiled Expression with numbers of this backend"""
+        if self.context is None:
+            return code.evaluate(env)
+        with localcontext(self.context):
+            return code.evaluate(env)
+
+    def finish(self, result):
+        """Prepares result of evaluation for display"""
+        if self.digits is not None and isinstance(result, float):
+            return round(result, self.digits)
+        return result
+
+    @staticmethod
+    def to_int(result):
+        """Converts integral result to int for bin/hex output
+        :raise BaseConversionError: - if result is not integral
+        """
+        if isinstance(result, int):
+            return result
+        if isinstance(result, Fraction) and result.denominator == 1:
+            return result.numerator
+        try:
+            if result == int(result):
+                return int(result)
+        except (ValueError, OverflowError, TypeError):
+            pass
+        raise BaseConversionError("Float value can't be displayed as bin or hex number.", result)
+
+
+_backends = {}
+
+
+def get_backend(name=None, precision=None):
+    """Returns backend by name, default one is set in config.ini
+    :param name: - one of BACKENDS
+    :param precision: - significant digits of decimal and mpmath backends
+    """
+    if name is None:
+        name = conf.get('calc_params', 'backend', fallback='float')
+    if precision is None:
+        precision = int(conf.get('calc_params', 'precision', fallback='50'))
+    key = (name, precision)
+    if key not in _backends:
+        if name not in BACKENDS:
+            raise ValueError(f"unknown backend {name}, expected one of {', '.join(BACKENDS)}")
+        _backends[key] = globals()['_' + name + '_backend'](precision)
+    return _backends[key]
+
+
+def _exact_ops(convert):
+    def div(a, b):
+        if type(a) is int and type(b) is int and b != 0 and a % b == 0:
+            return a // b
+        return convert(a) / b
+
+    def exact_power(a, b):
+        if type(a) is int and type(b) is int and b >= 0:
+            return power(a, b)
+        return power(convert(a), b)
+
+    return {ast.Div: div, ast.Pow: exact_power}
+
+
+def _float_backend(precision):
+    from calc.calc import MATH_NAMES
+    return Backend('float', names=MATH_NAMES, digits=3)
+
+
+def _decimal_backend(precision):
+    import mpmath
+    ctx = mpmath.MPContext()
+    ctx.dps = precision
+
+    def via_mpmath(func):
+        return lambda x: Decimal(str(func(ctx.mpf(str(x)))))
+
+    names = {
+        'sqrt': lambda x: Decimal(x).sqrt(),
+        'sin': via_mpmath(ctx.sin),
+        'cos': via_mpmath(ctx.cos),
+        'log': lambda x: Decimal(x).ln(),
+        'fabs': lambda x: abs(Decimal(x)),
+        'pi': Decimal(str(+ctx.pi)),
+        'e': Decimal(str(+ctx.e)),
+    }
+    return Backend('decimal', lambda value: Decimal(repr(value)), names, _exact_ops(Decimal),
+                   context=Context(prec=precision))
+
+
+def _fraction_sqrt(x):
+    x = Fraction(x)
+    if x >= 0:
+        num, den = math.isqrt(x.numerator), math.isqrt(x.denominator)
+        if num * num == x.numerator and den * den == x.denominator:
+            return Fraction(num, den)
+    return math.sqrt(x)
+
+
+def _fraction_literal(value):
+    # literal like 1e999 is parsed as inf, which has no exact value
+    if not math.isfinite(value):
+        raise CompileError("invalid input: number literal is too large")
+    return Fraction(repr(value))
+
+
+def _fraction_backend(precision):
+    names = {
+        'sqrt': _fraction_sqrt,
+        'sin': math.sin,
+        'cos': math.cos,
+        'log': math.log,
+        'fabs': abs,
+        'pi': math.pi,
+        'e': math.e,
+    }
+    return Backend('fraction', _fraction_literal, names, _exact_ops(Fraction))
+
+
+def _mpmath_backend(precision):
+    import mpmath
+    ctx = mpmath.MPContext()
+    ctx.dps = precision
+
+    names = {
+        'sqrt': ctx.sqrt,
+        'sin': ctx.sin,
+        'cos': ctx.cos,
+        'log': ctx.log,
+        'fabs': ctx.fabs,
+        'pi': +ctx.pi,
+        'e': +ctx.e,
+    }
+    return Backend('mpmath', lambda value: ctx.mpf(repr(value)), names, _exact_ops(ctx.mpf))
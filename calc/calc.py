@@ -1,41 +1,299 @@
-import parser
-import re
-from sympy import solve
+from collections import namedtuple
+from decimal import Context
+from fractions import Fraction
+from os.path import join
 from math import sqrt, sin, cos, pi, fabs, e, log
-import wx
+from time import perf_counter
+from calc import metrics
+from calc.backends import get_backend
+from calc.cache import LRUCache
+from calc.compiler import CompileError
+from calc.solve_cache import SolveCache
+from calc.errors import CalcError, InvalidInputError, EvaluationError, BaseConversionError
+from config.config import conf, root_dir
 
+EvalResult = namedtuple('EvalResult', ['value', 'error'])
 
-def evaluate(formula, func):
-    if formula == '':
-        return 0
+_MISSING = object()
+MATH_NAMES = {'sqrt': sqrt, 'sin': sin, 'cos': cos, 'pi': pi, 'fabs': fabs, 'e': e, 'log': log}
+_code_cache = LRUCache(int(conf.get('calc_params', 'cache_size', fallback='256')))
+_solve_cache_path = conf.get('equ_params', 'solve_cache_path', fallback='')
+_solve_cache = SolveCache(join(root_dir, _solve_cache_path) if _solve_cache_path else None,
+                          int(conf.get('equ_params', 'solve_cache_size', fallback='10000')),
+                          int(conf.get('calc_params', 'cache_size', fallback='256')))
+
+
+def normalize(formula):
     formula = formula.replace('^', '**', formula.count("^"))
     formula = formula.replace(',', '.', formula.count(","))
     formula = formula.replace('abs', 'fabs', formula.count("abs"))
     formula = formula.replace('\u221A', 'sqrt', formula.count("\u221A"))
-    exp = re.compile(r'[0-9a-fA-F.,+\-*&><|/sincoqrtpbxlg ()]+')
-    for char in formula:
-        if not re.match(exp, char):
-            return "invalid input"
+    return formula
 
-    try:
-        code = parser.expr(formula).compile()
-    except Exception as e:
-        print(e)
-        return "invalid input"
 
-    result = eval(code)
-    if func is not None:
+def compile_formula(formula, backend=None, store=True):
+    """Returns compiled Expression of the formula.
+    Results and errors are kept in LRU cache keyed by the raw formula and backend.
+    :param formula: - formula as typed by user
+    :param backend: - Backend object, default one is used if None
+    :param store: - put newly compiled formula into the cache, False for one-shot formulas of batches
+    :raise InvalidInputError: - if formula is not valid
+    """
+    if backend is None:
+        backend = get_backend()
+    key = (formula, backend.name)
+    code = _code_cache.get(key, _MISSING)
+    if code is _MISSING:
+        if metrics.ENABLED:
+            metrics.inc('compile_cache.miss')
         try:
-            return func(result)
-        except TypeError:
-            wx.MessageBox("Float value can't be displayed as bin or hex number.\nUsing dec instead.")
-    return round(result, 3)
+            code = compile_source(formula, backend)
+        except CompileError as error:
+            code = error
+        if store:
+            _code_cache.put(key, code)
+    elif metrics.ENABLED:
+        metrics.inc('compile_cache.hit')
+    if isinstance(code, CompileError):
+        if metrics.ENABLED:
+            metrics.inc('compile.errors')
+        raise InvalidInputError(str(code))
+    return code
 
 
-def solve_equation(equ):
-    if equ == '':
-        return 'nothing here'
+def compile_source(formula, backend, **kwargs):
+    """Normalizes and compiles formula without caching, kwargs are passed to Backend.compile"""
+    if not metrics.ENABLED:
+        return backend.compile(normalize(formula), **kwargs)
+    start = perf_counter()
+    normalized = normalize(formula)
+    middle = perf_counter()
+    try:
+        return backend.compile(normalized, **kwargs)
+    finally:
+        metrics.observe('normalize', middle - start)
+        metrics.observe('compile', perf_counter() - middle)
+
+
+def cache_stats():
+    """Returns hits, misses and evictions of the compiled formulas cache"""
+    return _code_cache.stats()
+
+
+def evaluate(formula, func, backend=None):
+    """
+    :param formula: - formula as typed by user
+    :param func: - None, bin or hex output formatting
+    :param backend: - name of number backend, see calc.backends.BACKENDS
+    :raise InvalidInputError: - if formula is not valid
+    :raise EvaluationError: - if evaluation fails, e.g. on division by zero
+    :raise BaseConversionError: - if result can't be formatted by func, dec result is in its value
+    """
+    if formula == '':
+        return 0
+    backend = get_backend(backend)
+    return _evaluate_code(compile_formula(formula, backend), func, backend)
+
+
+def _evaluate_code(code, base, backend):
+    return format_result(run_compiled(code, backend), base, backend)
+
+
+def run_compiled(code, backend, env=None):
+    """Evaluates compiled Expression
+    :param env: - values of free variables
+    :raise EvaluationError: - if evaluation fails, e.g. on division by zero
+    """
+    start = perf_counter() if metrics.ENABLED else None
+    try:
+        return backend.run(code, env)
+    except ZeroDivisionError as error:
+        if start is not None:
+            metrics.inc('eval.errors')
+        raise EvaluationError("division by zero") from error
+    except (ArithmeticError, ValueError, TypeError) as error:
+        if start is not None:
+            metrics.inc('eval.errors')
+        raise EvaluationError(str(error)) from error
+    finally:
+        if start is not None:
+            metrics.observe('eval', perf_counter() - start)
+
+
+def format_result(result, base, backend):
+    """Formats result of evaluation for display, numbers too long for str are turned into scientific notation
+    :param base: - None, bin or hex output formatting
+    :raise BaseConversionError: - if result can't be formatted by base, dec result is in its value
+    """
+    start = perf_counter() if metrics.ENABLED else None
+    try:
+        if base is not None:
+            try:
+                return base(backend.to_int(result))
+            except BaseConversionError as error:
+                error.value = _displayable(backend.finish(result))
+                raise
+        return _displayable(backend.finish(result))
+    finally:
+        if start is not None:
+            metrics.observe('format', perf_counter() - start)
+
+
+def _displayable(value):
+    """Exact numbers with more digits than str conversion allows are shown in scientific notation"""
+    if isinstance(value, int):
+        bits = value.bit_length()
+    elif isinstance(value, Fraction):
+        bits = max(value.numerator.bit_length(), value.denominator.bit_length())
+    else:
+        return value
+    if bits < 10000:  # about 3000 digits, below the default limit of 4300
+        return value
+    try:
+        str(value)
+        return value
+    except ValueError:
+        pass
+    context = Context(prec=16)
+    if isinstance(value, int):
+        return format(context.create_decimal(value), '.15e')
+    return format(context.divide(context.create_decimal(value.numerator),
+                                 context.create_decimal(value.denominator)), '.15e')
+
+
+def _evaluate_safe(formula, base, backend):
+    try:
+        return EvalResult(_evaluate_code(compile_formula(formula, backend), base, backend), None)
+    except CalcError as error:
+        return EvalResult(None, str(error))
+
+
+def iter_evaluate(formulas, base=None, backend=None):
+    """Lazily evaluates formulas one by one, errors are reported instead of raised
+    :param formulas: - iterable of formulas, may be a generator
+    :param base: - None, bin or hex output formatting
+    :param backend: - name of number backend, see calc.backends.BACKENDS
+    :return: - generator of EvalResult
+    """
+    backend = get_backend(backend)
+    for formula in formulas:
+        if formula == '':
+            yield EvalResult(0, None)
+        else:
+            yield _evaluate_safe(formula, base, backend)
+
+
+def evaluate_many(formulas, base=None, backend=None, store=False):
+    """Evaluates a batch of formulas, each distinct formula is validated and compiled once.
+    By default compiled formulas are kept for the batch only, so a big batch doesn't flush the shared cache
+    :param formulas: - iterable of formulas, items which are not str are reported as invalid
+    :param base: - None, bin or hex output formatting
+    :param backend: - name of number backend, see calc.backends.BACKENDS
+    :param store: - also put distinct formulas into the shared cache, for callers repeating the same formulas
+    :return: - list of EvalResult in the order of formulas
+    """
+    backend = get_backend(backend)
+    codes = {}
+    results = []
+    for formula in formulas:
+        if not isinstance(formula, str):
+            results.append(EvalResult(None, str(InvalidInputError(
+                f"invalid input: {type(formula).__name__} is not a formula"))))
+            continue
+        code = codes.get(formula, _MISSING)
+        if code is _MISSING:
+            try:
+                code = compile_formula(formula, backend, store=store) if formula != '' else None
+            except InvalidInputError as error:
+                code = error
+            codes[formula] = code
+        if code is None:
+            results.append(EvalResult(0, None))
+        elif isinstance(code, InvalidInputError):
+            results.append(EvalResult(None, str(code)))
+        else:
+            try:
+                results.append(EvalResult(_evaluate_code(code, base, backend), None))
+            except CalcError as error:
+                results.append(EvalResult(None, str(error)))
+    return results
+
+
+def normalize_equation(equ):
     equ = equ.replace('^', '**', equ.count("^"))
     equ = equ.replace(',', '.', equ.count(","))
     equ = equ.replace('\u221A', 'sqrt', equ.count("\u221A"))
-    return solve(equ)
+    return equ
+
+
+def solve_equation(equ):
+    """Solves equation with sympy, solutions are cached by canonical form of equation,
+    so 'x^2-1' and '-1+x**2' share cache entry. Polynomials of degree poly_numeric_degree
+    of config.ini and higher get numeric roots, see calc.poly. Metrics are recorded by the process which solves.
+    :param equ: - left part of equation 'equ = 0'
+    """
+    if equ == '':
+        return 'nothing here'
+    equ = normalize_equation(equ)
+    solution = _solve_cache.get_raw(equ)
+    if solution is not None:
+        if metrics.ENABLED:
+            metrics.inc('solve_cache.hit')
+        return solution
+
+    # polynomials of high degree get all numeric roots at once, sympy is slow on them and gives CRootOf
+    from calc import poly
+    found = poly.coefficients(equ)
+    if found is not None and len(found[1]) - 1 >= int(conf.get('equ_params', 'poly_numeric_degree', fallback='5')):
+        key = f"poly {found[0]} {found[1]!r}"
+        solution = _solve_cache.get(equ, key)
+        if solution is None:
+            with metrics.timed('solve_poly'):
+                solution = poly.roots(found[1])
+            _solve_cache.put(equ, key, solution)
+        elif metrics.ENABLED:
+            metrics.inc('solve_cache.hit')
+        return solution
+
+    from sympy import solve, sympify, srepr  # sympy is imported on first use, it takes seconds to load
+    expr = sympify(equ)
+    key = srepr(expr)
+    solution = _solve_cache.get(equ, key)
+    if solution is None:
+        with metrics.timed('solve'):
+            solution = solve(expr)
+        _solve_cache.put(equ, key, solution)
+    elif metrics.ENABLED:
+        metrics.inc('solve_cache.hit')
+    return solution
+
+
+def solve_cache_stats():
+    """Returns hits, misses and evictions of in-memory part of solutions cache"""
+    return _solve_cache.memory.stats()
+
+
+def solve_numeric(equ, lo=None, hi=None, samples=None):
+    """Finds real roots of equation with one unknown numerically, for equations sympy can't solve
+    :param equ: - left part of equation 'equ = 0'
+    :param lo: - left end of searched interval, config.ini value by default
+    :param hi: - right end of searched interval, config.ini value by default
+    :param samples: - number of grid points used to bracket roots
+    :return: - sorted list of float roots
+    """
+    from sympy import sympify, lambdify, diff, SympifyError
+    from calc.numeric import find_roots
+    lo = float(conf.get('equ_params', 'numeric_lo', fallback='-100')) if lo is None else lo
+    hi = float(conf.get('equ_params', 'numeric_hi', fallback='100')) if hi is None else hi
+    samples = int(conf.get('equ_params', 'numeric_samples', fallback='100000')) if samples is None else samples
+
+    try:
+        expr = sympify(normalize_equation(equ))
+    except SympifyError as error:
+        raise InvalidInputError(f"invalid input: {error}") from None
+    unknowns = expr.free_symbols
+    if len(unknowns) != 1:
+        raise InvalidInputError("numeric solve needs equation with exactly one unknown")
+    x = unknowns.pop()
+    with metrics.timed('solve_numeric'):
+        return find_roots(lambdify(x, expr, 'numpy'), lo, hi, samples, lambdify(x, diff(expr, x), 'numpy'))
\ No newline at end of file
@@ -0,0 +1,207 @@
+import ast
+import operator
+from fractions import Fraction
+from calc.errors import InvalidInputError
+
+# exact powers and shifts with results beyond it would take minutes or exhaust memory
+MAX_BITS = 1 << 16
+
+
+def _bits(value):
+    """Size of exact number in bits, None for numbers of limited precision"""
+    if type(value) is int:
+        return value.bit_length()
+    if isinstance(value, Fraction):
+        return max(value.numerator.bit_length(), value.denominator.bit_length())
+    return None
+
+
+def power(a, b):
+    """a ** b which fails with OverflowError instead of computing huge exact result"""
+    if type(b) is int and (b > 0 or isinstance(a, Fraction)):
+        bits = _bits(a)
+        if bits is not None and bits > 1 and abs(b) * bits > MAX_BITS:
+            raise OverflowError("result is too large")
+    return a ** b
+
+
+def lshift(a, b):
+    """a << b which fails with OverflowError instead of computing huge int"""
+    if type(a) is int and type(b) is int and b > 0 and a and a.bit_length() + b > MAX_BITS:
+        raise OverflowError("result is too large")
+    return a << b
+
+
+BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: power,
+    ast.BitOr: operator.or_,
+    ast.BitAnd: operator.and_,
+    ast.BitXor: operator.xor,
+    ast.LShift: lshift,
+    ast.RShift: operator.rshift,
+}
+
+UNARY_OPS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Invert: operator.invert,
+}
+
+# errors which are left to be raised on evaluation instead of constant folding
+_RUNTIME_ERRORS = (ArithmeticError, ValueError, TypeError)
+
+
+class CompileError(InvalidInputError):
+    """Raised when formula has a syntax error or uses nodes and names that are not allowed"""
+
+
+class Expression:
+    """Compiled formula
+    evaluate - function of one argument, mapping of free variable values
+    variables - names of free variables used in the formula
+    """
+    __slots__ = ('evaluate', 'variables')
+
+    def __init__(self, evaluate, variables):
+        self.evaluate = evaluate
+        self.variables = variables
+
+
+def compile_expr(formula, names, variables=None, number=None, ops=None, memo=None):
+    """Parses formula once and builds a tree of closures evaluating it
+    :param formula: - normalized formula, python expression syntax
+    :param names: - mapping of allowed functions and constants
+    :param variables: - allowed free variable names, None allows any name missing in names
+    :param number: - converter applied to float literals
+    :param ops: - mapping of ast operator classes to functions overriding BIN_OPS
+    :param memo: - LRUCache of compiled subexpressions keyed by their source, lets formula being typed
+    reuse work done for its previous version; only for calls with the same names and variables
+    :return: - Expression object
+    """
+    try:
+        tree = ast.parse(formula, mode='eval')
+    except (SyntaxError, ValueError, MemoryError, RecursionError) as e:
+        raise CompileError(f"invalid input: {e}") from None
+    compiler = _Compiler(names, variables, number, ops, memo if formula.isascii() else None, formula)
+    try:
+        is_const, value = compiler.compile(tree.body)
+    except RecursionError:
+        raise CompileError("invalid input: formula is nested too deeply") from None
+    if is_const:
+        return Expression(lambda env=None: value, frozenset())
+    return Expression(value, frozenset(compiler.used))
+
+
+class _Compiler:
+    """Turns whitelisted AST nodes into closures, constant subtrees are folded"""
+
+    def __init__(self, names, variables, number, ops, memo, source):
+        self.names = names
+        self.variables = variables
+        self.number = number
+        self.ops = BIN_OPS if ops is None else {**BIN_OPS, **ops}
+        self.used = set()
+        self.memo = memo
+        self.source = source
+
+    def compile(self, node):
+        """Returns (True, value) for constant nodes and (False, closure) otherwise"""
+        method = getattr(self, '_' + type(node).__name__, None)
+        if method is None:
+            raise CompileError(f"invalid input: {type(node).__name__} is not allowed")
+        if self.memo is None:
+            return method(node)
+        # offsets are in bytes, memo is used only for ascii formulas where they match str indices
+        key = self.source[node.col_offset:node.end_col_offset]
+        entry = self.memo.get(key)
+        if entry is not None:
+            compiled, used = entry
+        else:
+            # free variables of the subexpression are remembered with it, a hit must report them too
+            outer, self.used = self.used, set()
+            try:
+                compiled = method(node)
+            finally:
+                used, self.used = frozenset(self.used), outer
+            self.memo.put(key, (compiled, used))
+        self.used.update(used)
+        return compiled
+
+    def _Constant(self, node):
+        if type(node.value) not in (int, float):
+            raise CompileError(f"invalid input: {node.value!r} is not a number")
+        if self.number is not None and type(node.value) is float:
+            try:
+                return True, self.number(node.value)
+            except CompileError:
+                raise
+            except (ValueError, ArithmeticError, TypeError):
+                raise CompileError(f"invalid input: {node.value!r} is not a valid number") from None
+        return True, node.value
+
+    def _Name(self, node):
+        name = node.id
+        if name in self.names:
+            return True, self.names[name]
+        if self.variables is not None and name not in self.variables:
+            raise CompileError(f"invalid input: unknown name {name}")
+        self.used.add(name)
+        return False, lambda env: env[name]
+
+    def _UnaryOp(self, node):
+        op = UNARY_OPS.get(type(node.op))
+        if op is None:
+            raise CompileError(f"invalid input: {type(node.op).__name__} is not allowed")
+        is_const, operand = self.compile(node.operand)
+        if is_const:
+            try:
+                return True, op(operand)
+            except _RUNTIME_ERRORS:
+                return False, lambda env: op(operand)
+        return False, lambda env: op(operand(env))
+
+    def _BinOp(self, node):
+        op = self.ops.get(type(node.op))
+        if op is None:
+            raise CompileError(f"invalid input: {type(node.op).__name__} is not allowed")
+        left_const, left = self.compile(node.left)
+        right_const, right = self.compile(node.right)
+        if left_const and right_const:
+            try:
+                return True, op(left, right)
+            except _RUNTIME_ERRORS:
+                return False, lambda env: op(left, right)
+        if left_const:
+            return False, lambda env: op(left, right(env))
+        if right_const:
+            return False, lambda env: op(left(env), right)
+        return False, lambda env: op(left(env), right(env))
+
+    def _Call(self, node):
+        if not isinstance(node.func, ast.Name) or not callable(self.names.get(node.func.id)):
+            raise CompileError("invalid input: only known functions can be called")
+        if node.keywords or any(isinstance(arg, ast.Starred) for arg in node.args):
+            raise CompileError("invalid input: only positional arguments are allowed")
+        func = self.names[node.func.id]
+        args = [self.compile(arg) for arg in node.args]
+        if all(is_const for is_const, _ in args):
+            values = [value for _, value in args]
+            try:
+                return True, func(*values)
+            except _RUNTIME_ERRORS:
+                return False, lambda env: func(*values)
+        args = [value if not is_const else _constant(value) for is_const, value in args]
+        if len(args) == 1:
+            arg = args[0]
+            return False, lambda env: func(arg(env))
+        return False, lambda env: func(*[arg(env) for arg in args])
+
+
+def _constant(value):
+    return lambda env: value
@@ -0,0 +1,20 @@
+class CalcError(Exception):
+    """Base class for errors of the calc engine"""
+
+
+class InvalidInputError(CalcError, ValueError):
+    """Raised when formula can't be parsed or uses names that are not allowed"""
+
+
+class EvaluationError(CalcError, ArithmeticError):
+    """Raised when valid formula fails on evaluation, e.g. division by zero"""
+
+
+class BaseConversionError(CalcError, TypeError):
+    """Raised when result can't be displayed as bin or hex number
+    value - result of evaluation in dec
+    """
+
+    def __init__(self, message, value):
+        super().__init__(message)
+        self.value = value
@@ -0,0 +1,303 @@
+"""Integer engine of bin/hex input
+
+Formulas are evaluated with ints only, results wrap to the word size in two's complement.
+Operators follow programmer calculators rather than python math:
+    ^ and xor() - exclusive or, ** - power
+    && and || - same as & and |
+    / - division truncated toward zero, // - floor division, % - remainder of floor division
+    >> - arithmetic shift of signed words, logical shift of unsigned ones
+    rol(x, n), ror(x, n) - rotation inside the word, popcount(x) - number of set bits
+
+    evaluate('0xff + 1', bits=8, signed=False)  ->  0
+    evaluate('0x7f << 1', hex, bits=8)  ->  '0xfe', dec output is -2
+"""
+import ast
+from calc.backends import Backend
+from calc.cache import LRUCache
+from calc.calc import run_compiled, format_result
+from calc.compiler import CompileError, MAX_BITS
+from calc.errors import InvalidInputError, EvaluationError
+from config.config import conf
+
+WORD_SIZES = (8, 16, 32, 64, None)
+
+_MISSING = object()
+_code_cache = LRUCache(int(conf.get('calc_params', 'cache_size', fallback='256')))
+_backends = {}
+
+
+def normalize(formula):
+    formula = formula.replace('&&', '&', formula.count('&&'))
+    formula = formula.replace('||', '|', formula.count('||'))
+    return formula.strip()
+
+
+def _float_literal(value):
+    raise CompileError(f"invalid input: {value!r} is not an integer")
+
+
+class IntBackend(Backend):
+    """Backend of ints wrapped to word of bits, None bits are arbitrary size"""
+
+    def __init__(self, bits=None, signed=True):
+        self.bits = bits
+        self.signed = signed
+        self.mask = None if bits is None else (1 << bits) - 1
+        self.sign = None if bits is None else 1 << (bits - 1)
+        name = 'int' if bits is None else f"{'' if signed else 'u'}int{bits}"
+        names = {'rol': self.rol, 'ror': self.ror, 'popcount': self.popcount, 'xor': self.xor}
+        super().__init__(name, _float_literal, names, self._ops())
+
+    def wrap(self, value):
+        """Reduces value to the word, two's complement for signed words"""
+        if self.mask is None:
+            return value
+        value &= self.mask
+        if self.signed and value & self.sign:
+            value -= 1 << self.bits
+        return value
+
+    def _ops(self):
+        wrap = self.wrap
+
+        def ring(func):
+            # results of ring operations wrap the same whether operands were wrapped or not
+            return lambda a, b: wrap(func(a, b))
+
+        def div(a, b):
+            a, b = wrap(a), wrap(b)
+            if b == 0:
+                raise ZeroDivisionError
+            quotient = abs(a) // abs(b)
+            return wrap(-quotient if (a < 0) != (b < 0) else quotient)
+
+        def floordiv(a, b):
+            return wrap(wrap(a) // wrap(b))
+
+        def mod(a, b):
+            return wrap(wrap(a) % wrap(b))
+
+        def power(a, b):
+            b = wrap(b)
+            if b < 0:
+                raise ValueError("negative power of integer")
+            if self.mask is None:
+                if b * max(a.bit_length(), 1) > MAX_BITS:
+                    raise OverflowError("result is too large")
+                return a ** b
+            return wrap(pow(a, b, 1 << self.bits))
+
+        def lshift(a, b):
+            b = wrap(b)
+            if self.mask is not None:
+                return wrap(a << b) if b < self.bits else 0
+            if b > MAX_BITS:
+                raise OverflowError("shift count is too large")
+            return a << b
+
+        def rshift(a, b):
+            return wrap(wrap(a) >> wrap(b))
+
+        return {
+            ast.Add: ring(int.__add__),
+            ast.Sub: ring(int.__sub__),
+            ast.Mult: ring(int.__mul__),
+            ast.BitOr: ring(int.__or__),
+            ast.BitAnd: ring(int.__and__),
+            ast.BitXor: ring(int.__xor__),
+            ast.Div: div,
+            ast.FloorDiv: floordiv,
+            ast.Mod: mod,
+            ast.Pow: power,
+            ast.LShift: lshift,
+            ast.RShift: rshift,
+        }
+
+    def rol(self, value, count):
+        if self.mask is None:
+            raise ValueError("rotation needs fixed word size")
+        value, count = self.wrap(value) & self.mask, count % self.bits
+        return self.wrap(value << count | value >> (self.bits - count))
+
+    def ror(self, value, count):
+        if self.mask is None:
+            raise ValueError("rotation needs fixed word size")
+        return self.rol(value, -count)
+
+    def popcount(self, value):
+        value = self.wrap(value)
+        if value < 0 and self.mask is None:
+            raise ValueError("negative integer has infinite number of set bits")
+        return (value & self.mask if self.mask is not None else value).bit_count()
+
+    def xor(self, a, b):
+        return self.wrap(a ^ b)
+
+    def finish(self, result):
+        return self.wrap(result)
+
+    def to_int(self, result):
+        """Bit pattern of the word for bin/hex output, negative values of fixed words are shown unsigned"""
+        result = self.wrap(result)
+        return result if self.mask is None else result & self.mask
+
+
+def get_int_backend(bits=_MISSING, signed=None):
+    """Returns integer backend, word size and signedness are set in config.ini by default
+    :param bits: - one of WORD_SIZES, None is arbitrary size
+    """
+    if bits is _MISSING:
+        word = conf.get('int_params', 'word_size', fallback='64')
+        bits = None if word in ('', 'any') else int(word)
+    if signed is None:
+        signed = conf.get('int_params', 'signed', fallback='1') == '1'
+    if bits not in WORD_SIZES:
+        raise ValueError(f"unsupported word size {bits}, expected one of 8, 16, 32, 64 or None")
+    key = (bits, signed)
+    if key not in _backends:
+        _backends[key] = IntBackend(bits, signed)
+    return _backends[key]
+
+
+def compile_int(formula, backend):
+    key = (formula, backend.name)
+    code = _code_cache.get(key, _MISSING)
+    if code is _MISSING:
+        try:
+            code = backend.compile(normalize(formula))
+        except CompileError as error:
+            code = error
+        _code_cache.put(key, code)
+    if isinstance(code, CompileError):
+        raise InvalidInputError(str(code))
+    return code
+
+
+def evaluate(formula, base=None, bits=_MISSING, signed=None):
+    """
+    :param formula: - integer formula, literals may be dec, bin or hex
+    :param base: - None, bin or hex output formatting
+    :param bits: - one of WORD_SIZES, config.ini value by default
+    :param signed: - two's complement signed words, config.ini value by default
+    :raise InvalidInputError: - if formula is not valid or uses floats
+    :raise EvaluationError: - if evaluation fails, e.g. on division by zero
+    """
+    if formula in ('', '0b', '0x'):
+        return 0
+    backend = get_int_backend(bits, signed)
+    return format_result(run_compiled(compile_int(formula, backend), backend), base, backend)
+
+
+# numpy dtypes of word sizes, arbitrary size uses python ints in object arrays
+_DTYPES = {(8, True): 'int8', (16, True): 'int16', (32, True): 'int32', (64, True): 'int64',
+           (8, False): 'uint8', (16, False): 'uint16', (32, False): 'uint32', (64, False): 'uint64',
+           (None, True): 'object', (None, False): 'object'}
+_array_backends = {}
+
+
+def _array_backend(bits, signed):
+    """Backend with numpy operations over integer arrays of the word dtype"""
+    import numpy as np
+    key = (bits, signed)
+    if key in _array_backends:
+        return _array_backends[key]
+    dtype = np.dtype(_DTYPES[key])
+    scalar = get_int_backend(bits, signed)
+
+    def operand(value):
+        # python int literals are wrapped first, numpy refuses out of range ones
+        return dtype.type(scalar.wrap(value)) if isinstance(value, int) and dtype.kind != 'O' else value
+
+    def ufunc(func):
+        return lambda a, b: func(operand(a), operand(b))
+
+    def div(a, b):
+        a, b = operand(a), operand(b)
+        if np.any(b == 0):
+            raise ZeroDivisionError
+        quotient = a // b
+        # floor division is turned into truncation where signs differ and remainder is not zero
+        return quotient + ((a % b != 0) & ((a < 0) != (b < 0))).astype(dtype)
+
+    def shift(func):
+        def shift_op(a, b):
+            a, b = operand(a), np.asarray(b)
+            if np.any(b < 0):
+                raise ValueError("negative shift count")
+            if bits is None:
+                if np.any(b > MAX_BITS):
+                    raise OverflowError("shift count is too large")
+                return func(a, b)
+            # shifts by word size or more are undefined in C, numpy follows it
+            fill = np.where(np.asarray(a) < 0, -1, 0).astype(dtype) if func is np.right_shift else dtype.type(0)
+            return np.where(b < bits, func(a, np.minimum(b, bits - 1).astype(dtype)), fill)
+        return shift_op
+
+    def rotate(left):
+        def rotate_func(value, count):
+            if bits is None:
+                raise ValueError("rotation needs fixed word size")
+            unsigned = np.asarray(operand(value)).astype(f'uint{bits}')
+            count = (np.asarray(count) if left else -np.asarray(count)) % bits
+            count = count.astype(unsigned.dtype)
+            back = (bits - count) % bits
+            return (unsigned << count | unsigned >> back).astype(dtype)
+        return rotate_func
+
+    def popcount(value):
+        if bits is None:
+            return np.vectorize(scalar.popcount, otypes=[object])(value)
+        return np.bitwise_count(np.asarray(operand(value)).astype(f'uint{bits}')).astype(dtype)
+
+    ops = {
+        ast.Add: ufunc(np.add),
+        ast.Sub: ufunc(np.subtract),
+        ast.Mult: ufunc(np.multiply),
+        ast.BitOr: ufunc(np.bitwise_or),
+        ast.BitAnd: ufunc(np.bitwise_and),
+        ast.BitXor: ufunc(np.bitwise_xor),
+        ast.Div: div,
+        ast.FloorDiv: ufunc(np.floor_divide),
+        ast.Mod: ufunc(np.remainder),
+        ast.Pow: ufunc(np.power),
+        ast.LShift: shift(np.left_shift),
+        ast.RShift: shift(np.right_shift),
+    }
+    names = {'rol': rotate(True), 'ror': rotate(False), 'popcount': popcount, 'xor': ufunc(np.bitwise_xor)}
+    backend = _array_backends[key] = Backend(f'array_{scalar.name}', _float_literal, names, ops)
+    backend.dtype = dtype
+    return backend
+
+
+def evaluate_array(formula, bits=_MISSING, signed=None, **variables):
+    """Evaluates integer formula over arrays of values in one vectorized pass, e.g. for bulk masks
+    :param variables: - values of free variables, converted to the dtype of the word
+    :return: - numpy array of the word dtype, object array of ints for arbitrary size
+    """
+    import numpy as np
+    scalar = get_int_backend(bits, signed)
+    backend = _array_backend(scalar.bits, scalar.signed)
+    key = (formula, backend.name)
+    code = _code_cache.get(key, _MISSING)
+    if code is _MISSING:
+        try:
+            code = backend.compile(normalize(formula), variables=None)
+        except CompileError as error:
+            code = error
+        _code_cache.put(key, code)
+    if isinstance(code, CompileError):
+        raise InvalidInputError(str(code))
+    unknown = code.variables - variables.keys()
+    if unknown:
+        raise InvalidInputError(f"invalid input: unknown names {', '.join(sorted(unknown))}")
+    env = {name: np.asarray(value).astype(backend.dtype) for name, value in variables.items()}
+    try:
+        with np.errstate(over='ignore'):
+            result = code.evaluate(env)
+    except ZeroDivisionError as error:
+        raise EvaluationError("division by zero") from error
+    except (ArithmeticError, ValueError, TypeError) as error:
+        raise EvaluationError(str(error)) from error
+    if isinstance(result, int):
+        result = scalar.wrap(result)  # formula without variables
+    return np.asarray(result, dtype=backend.dtype)
@@ -0,0 +1,369 @@
+"""Systems of linear equations
+
+Equations are separated by ';' or new lines, each is 'left = right' or its left part with
+'= 0' implied, e.g. "2*x + y = 3; x - y = 0". Equations are parsed straight into sparse
+coefficient triplets, solved by LU decomposition of numpy, or by least squares when the
+system is not square or singular. Big mostly-zero systems use scipy.sparse if it is
+installed, otherwise big systems with coefficients near the diagonal, e.g. tridiagonal
+ones, are solved by banded LU without storing the zeros. Exact rational solution by
+Gauss-Jordan elimination is done only on request.
+"""
+import ast
+import math
+import re
+from fractions import Fraction
+import numpy as np
+from calc.errors import InvalidInputError, EvaluationError
+from config.config import conf
+
+# constants and functions allowed in coefficients
+NAMES = {'pi': math.pi, 'e': math.e, 'sqrt': math.sqrt, 'sin': math.sin, 'cos': math.cos, 'log': math.log,
+         'abs': abs}
+
+_separator = re.compile(r'[;\n]')
+
+# side made of terms like '2.5*x' or '- y' or '7' is parsed by regex, anything else by ast
+_NUMBER = r'(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?'
+_NAME = r'[A-Za-z_]\w*'
+_TERM = rf'(?:[+-]?\s*{_NUMBER}\s*\*\s*)?(?:{_NAME}|{_NUMBER})'
+_simple_side = re.compile(rf'\s*[+-]?\s*{_TERM}(?:\s*[+-]\s*{_TERM})*\s*')
+_simple_term = re.compile(rf'([+-]?)\s*(?:([+-]?)\s*({_NUMBER})\s*\*\s*)?(?:({_NAME})|({_NUMBER}))')
+
+
+class LinearSolution:
+    """Solution of linear system
+    names - unknowns in order of first appearance
+    values - numpy array of floats, or list of Fractions for exact solution
+    rank - rank of coefficient matrix, less than len(names) if solution is not unique
+    residual - norm of A x - b, not zero if the system has no solution and least squares one is given
+    method - 'lu', 'banded lu', 'sparse lu', 'least squares', 'sparse least squares' or 'exact'
+    """
+
+    def __init__(self, names, values, rank, residual, method):
+        self.names = names
+        self.values = values
+        self.rank = rank
+        self.residual = residual
+        self.method = method
+
+    def __getitem__(self, name):
+        return self.values[self.names.index(name)]
+
+    def as_dict(self):
+        return dict(zip(self.names, self.values))
+
+    def __str__(self, limit=10):
+        shown = ', '.join(f"{name} = {_format(value)}" for name, value in zip(self.names[:limit], self.values))
+        if len(self.names) > limit:
+            shown += f", ... ({len(self.names)} unknowns)"
+        if self.rank < len(self.names):
+            # elimination doesn't give least norm solution, free unknowns are just set to zero
+            shown += " (not unique, one particular solution, free unknowns = 0)" if self.method == 'exact' \
+                else " (not unique, least norm one)"
+        if self.residual > 1e-9 * max(1.0, len(self.names)):
+            shown += f" (no exact solution, residual {self.residual:.3g})"
+        return shown
+
+
+def _format(value):
+    return str(value) if isinstance(value, Fraction) else f"{value:.10g}"
+
+
+class _System:
+    """Coefficients of parsed equations in coordinate format"""
+
+    def __init__(self, number):
+        self.number = number
+        self.names = {}  # name -> column
+        self.rows = []
+        self.cols = []
+        self.values = []
+        self.rhs = []
+
+    def add(self, equation):
+        left, sign, right = equation.partition('=')
+        if '=' in right:
+            raise InvalidInputError(f"invalid input: more than one '=' in {equation.strip()}")
+        terms, constant = {}, self.number(0)
+        for side, factor in ((left, 1), (right, -1)):
+            if not side.strip():
+                if sign:
+                    raise InvalidInputError(f"invalid input: empty side of {equation.strip()}")
+                continue
+            if _simple_side.fullmatch(side):
+                side_terms, side_constant = self._simple(side)
+            else:
+                try:
+                    tree = ast.parse(side.replace('^', '**').strip(), mode='eval')
+                except SyntaxError as error:
+                    raise InvalidInputError(f"invalid input: {error.msg} in {side.strip()}") from None
+                side_terms, side_constant = self._linear(tree.body)
+            if not terms and factor == 1:
+                terms = side_terms
+            else:
+                for name, coefficient in side_terms.items():
+                    terms[name] = terms.get(name, 0) + factor * coefficient
+            constant += factor * side_constant
+        names = self.names
+        columns = [names.setdefault(name, len(names)) for name, coefficient in terms.items() if coefficient != 0]
+        self.rows.extend([len(self.rhs)] * len(columns))
+        self.cols.extend(columns)
+        self.values.extend([coefficient for coefficient in terms.values() if coefficient != 0])
+        self.rhs.append(-constant)
+
+    def _simple(self, side):
+        number = self.number
+        one = number(1)
+        terms, constant = {}, number(0)
+        for sign, coefficient_sign, coefficient, name, value in _simple_term.findall(side):
+            coefficient = number(coefficient) if coefficient else one
+            if (sign == '-') != (coefficient_sign == '-'):
+                coefficient = -coefficient
+            if value:
+                constant += coefficient * number(value)
+            elif name in NAMES:
+                if callable(NAMES[name]):
+                    raise InvalidInputError(f"invalid input: {name} is a function")
+                constant += coefficient * number(NAMES[name])
+            elif name in terms:
+                terms[name] += coefficient
+            else:
+                terms[name] = coefficient
+        return terms, constant
+
+    def _linear(self, node):
+        """Returns ({name: coefficient}, constant) of linear expression"""
+        # long sums are flattened without recursion, e.g. x1 + x2 + ... + x5000
+        parts = []
+        while isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub)):
+            parts.append((-1 if isinstance(node.op, ast.Sub) else 1, node.right))
+            node = node.left
+        parts.append((1, node))
+        terms, constant = {}, self.number(0)
+        for sign, part in reversed(parts):
+            part_terms, part_constant = self._term(part)
+            for name, coefficient in part_terms.items():
+                terms[name] = terms.get(name, 0) + sign * coefficient
+            constant += sign * part_constant
+        return terms, constant
+
+    def _term(self, node):
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return {}, self.number(node.value)
+        if isinstance(node, ast.Name):
+            if node.id in NAMES:
+                return {}, self.number(NAMES[node.id])
+            return {node.id: self.number(1)}, self.number(0)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            terms, constant = self._term(node.operand)
+            if isinstance(node.op, ast.UAdd):
+                return terms, constant
+            return {name: -value for name, value in terms.items()}, -constant
+        if isinstance(node, ast.BinOp):
+            if isinstance(node.op, (ast.Add, ast.Sub)):
+                return self._linear(node)
+            left_terms, left = self._term(node.left)
+            right_terms, right = self._term(node.right)
+            if isinstance(node.op, ast.Mult) and not (left_terms and right_terms):
+                if left_terms:
+                    return {name: value * right for name, value in left_terms.items()}, left * right
+                return {name: left * value for name, value in right_terms.items()}, left * right
+            if isinstance(node.op, ast.Div) and not right_terms:
+                if right == 0:
+                    raise EvaluationError("division by zero in coefficient")
+                return {name: value / right for name, value in left_terms.items()}, left / right
+            if isinstance(node.op, ast.Pow) and not left_terms and not right_terms:
+                return {}, self.number(float(left) ** float(right))
+            raise InvalidInputError(f"invalid input: {ast.unparse(node)} is not linear")
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and callable(NAMES.get(node.func.id)) \
+                and not node.keywords:
+            args = [self._term(arg) for arg in node.args]
+            if all(not terms for terms, _ in args):
+                try:
+                    return {}, self.number(NAMES[node.func.id](*[float(value) for _, value in args]))
+                except (ValueError, TypeError) as error:
+                    raise EvaluationError(f"{ast.unparse(node)}: {error}") from None
+            raise InvalidInputError(f"invalid input: {ast.unparse(node)} is not linear")
+        raise InvalidInputError(f"invalid input: {ast.unparse(node)} is not allowed")
+
+
+def parse(text, exact=False):
+    """Parses system into coordinate format
+    :return: - (names, rows, cols, values, rhs), values and rhs are floats or Fractions if exact
+    """
+    system = _System(_fraction if exact else float)
+    for equation in _separator.split(text):
+        if equation.strip():
+            system.add(equation)
+    if not system.rhs:
+        raise InvalidInputError("invalid input: no equations")
+    return list(system.names), system.rows, system.cols, system.values, system.rhs
+
+
+def _fraction(value):
+    # literals are taken as typed, 0.1 is 1/10
+    return Fraction(repr(value)) if isinstance(value, float) else Fraction(value)
+
+
+def solve(text, exact=False, sparse=None):
+    """Solves system of linear equations
+    :param text: - equations separated by ';' or new lines
+    :param exact: - rational solution by exact elimination, slow for big systems
+    :param sparse: - use scipy.sparse, by default if system is big and mostly zero and scipy is installed
+    :return: - LinearSolution
+    """
+    names, rows, cols, values, rhs = parse(text, exact)
+    if exact:
+        return _solve_exact(names, rows, cols, values, rhs)
+    shape = (len(rhs), len(names))
+    if sparse is None:
+        density = len(values) / max(shape[0] * shape[1], 1)
+        sparse = min(shape) >= int(conf.get('linear_params', 'sparse_min', fallback='500')) and \
+            density <= float(conf.get('linear_params', 'sparse_density', fallback='0.01'))
+    b = np.array(rhs, dtype=float)
+    if sparse:
+        try:
+            return _solve_sparse(names, rows, cols, values, b, shape)
+        except ImportError:
+            pass  # scipy is optional, banded or dense solve is used instead
+    if shape[0] == shape[1] and shape[0] >= int(conf.get('linear_params', 'sparse_min', fallback='500')):
+        solution = _solve_banded(names, rows, cols, values, b)
+        if solution is not None:
+            return solution
+    # coefficients of the same unknown in one equation are already summed, so no index repeats
+    a = np.zeros(shape)
+    a[np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)] = values
+    if shape[0] == shape[1]:
+        try:
+            x = np.linalg.solve(a, b)
+            return LinearSolution(names, x, shape[1], float(np.linalg.norm(a @ x - b)), 'lu')
+        except np.linalg.LinAlgError:
+            pass  # singular system, least squares gives least norm solution
+    x, _, rank, _ = np.linalg.lstsq(a, b, rcond=None)
+    return LinearSolution(names, x, int(rank), float(np.linalg.norm(a @ x - b)), 'least squares')
+
+
+def _solve_sparse(names, rows, cols, values, b, shape):
+    from scipy import sparse
+    from scipy.sparse import linalg
+    a = sparse.csr_matrix((values, (rows, cols)), shape=shape)  # duplicates are summed
+    if shape[0] == shape[1]:
+        with np.errstate(all='ignore'):
+            x = linalg.spsolve(a.tocsc(), b)
+        if np.all(np.isfinite(x)):
+            return LinearSolution(names, x, shape[1], float(np.linalg.norm(a @ x - b)), 'sparse lu')
+    x = linalg.lsqr(a, b, atol=1e-12, btol=1e-12)[0]
+    residual = float(np.linalg.norm(a @ x - b))
+    # rank is not known without factorization, solution is reported as not unique if it is not exact
+    return LinearSolution(names, x, shape[1] if residual < 1e-9 else min(shape) - 1, residual,
+                          'sparse least squares')
+
+
+def _solve_banded(names, rows, cols, values, b):
+    """LU with partial pivoting of square system whose coefficients are all near the diagonal,
+    returns None if the band is too wide or the system is singular
+    """
+    n = len(b)
+    rows, cols = np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)
+    lower, upper = int(np.max(rows - cols, initial=0)), int(np.max(cols - rows, initial=0))
+    if lower + upper + 1 > int(conf.get('linear_params', 'band_max', fallback='64')):
+        return None
+    width = lower + upper + 1
+    # row r of band holds columns r - lower .. r + upper, rows below n are zero padding
+    band = np.zeros((n + lower, width))
+    band[rows, cols - rows + lower] = values
+    rhs = np.concatenate([b, np.zeros(lower)])
+    # rows k .. k + lower not yet eliminated, columns k .. k + lower + upper; fill-in never goes further
+    window = np.zeros((lower + 1, width))
+    for r in range(min(lower + 1, n)):
+        window[r, :width - lower + r] = band[r, lower - r:]
+    window_rhs = rhs[:lower + 1].copy()
+    factors = np.empty((n, width))  # row k of U, columns k .. k + lower + upper
+    y = np.empty(n)
+    for k in range(n):
+        pivot = int(np.argmax(np.abs(window[:, 0])))
+        if window[pivot, 0] == 0:
+            return None  # singular, least squares is used instead
+        if pivot:
+            window[[0, pivot]] = window[[pivot, 0]]
+            window_rhs[[0, pivot]] = window_rhs[[pivot, 0]]
+        factors[k], y[k] = window[0], window_rhs[0]
+        if lower:
+            multipliers = window[1:, 0] / window[0, 0]
+            window[1:] -= multipliers[:, None] * window[0]
+            window_rhs[1:] -= multipliers * window_rhs[0]
+            # the next row enters with columns k + 1 .. k + 1 + lower + upper, exactly its band
+            window[:-1, :-1], window[:-1, -1] = window[1:, 1:], 0.0
+            window_rhs[:-1] = window_rhs[1:]
+            if k + lower + 1 < n + lower:
+                window[-1], window_rhs[-1] = band[k + lower + 1], rhs[k + lower + 1]
+        elif k + 1 < n:
+            window[0], window_rhs[0] = band[k + 1], rhs[k + 1]
+
+    x = np.zeros(n + width)
+    with np.errstate(all='ignore'):
+        for k in range(n - 1, -1, -1):
+            x[k] = (y[k] - factors[k, 1:] @ x[k + 1:k + width]) / factors[k, 0]
+    x = x[:n]
+    if not np.all(np.isfinite(x)):
+        return None
+    residual = np.bincount(rows, weights=np.asarray(values, dtype=float) * x[cols], minlength=n) - b
+    return LinearSolution(names, x, n, float(np.linalg.norm(residual)), 'banded lu')
+
+
+def _solve_exact(names, rows, cols, values, rhs):
+    """Gauss-Jordan elimination over Fractions on rows stored as dicts, zeros are never stored"""
+    n = len(names)
+    equations = [dict() for _ in rhs]
+    for row, col, value in zip(rows, cols, values):
+        equations[row][col] = equations[row].get(col, 0) + value
+    equations = [(coefficients, rhs[row]) for row, coefficients in enumerate(equations)]
+
+    pivots = {}  # column -> (coefficients, constant) with coefficient 1 at the column
+    for coefficients, constant in equations:
+        # pivots found so far are eliminated from the row
+        for col in [col for col in coefficients if col in pivots]:
+            factor = coefficients.get(col)
+            if not factor:
+                continue
+            pivot, pivot_constant = pivots[col]
+            for pivot_col, value in pivot.items():
+                updated = coefficients.get(pivot_col, 0) - factor * value
+                if updated:
+                    coefficients[pivot_col] = updated
+                else:
+                    coefficients.pop(pivot_col, None)
+            constant -= factor * pivot_constant
+        coefficients = {col: value for col, value in coefficients.items() if value}
+        if not coefficients:
+            if constant != 0:
+                raise EvaluationError("system has no solution")
+            continue
+        col = min(coefficients, key=lambda c: (len(str(coefficients[c])), c))
+        factor = coefficients[col]
+        coefficients = {c: value / factor for c, value in coefficients.items()}
+        constant /= factor
+        # new pivot is eliminated from the older ones, so every pivot row keeps one pivot column
+        for other_col, (other, other_constant) in pivots.items():
+            value = other.get(col)
+            if value:
+                for c, v in coefficients.items():
+                    updated = other.get(c, 0) - value * v
+                    if updated:
+                        other[c] = updated
+                    else:
+                        other.pop(c, None)
+                pivots[other_col] = (other, other_constant - value * constant)
+        pivots[col] = (coefficients, constant)
+
+    # free unknowns are set to zero
+    solution = [Fraction(0)] * n
+    for col, (_, constant) in pivots.items():
+        solution[col] = constant
+    return LinearSolution(names, solution, len(pivots), 0.0, 'exact')
+
+
+def solve_file(path, exact=False):
+    """Solves system stored in text file, one equation per line"""
+    with open(path, encoding='utf-8') as file:
+        return solve(file.read(), exact)
@@ -0,0 +1,187 @@
+"""Counters and latency histograms of calculation stages
+
+Recording is off unless enabled in config.ini or by enable(). Hot paths check ENABLED
+before reading the clock, so disabled instrumentation costs one attribute lookup.
+
+    if metrics.ENABLED:
+        metrics.observe('compile', seconds)
+
+Collected values are read by snapshot(), rendered in Prometheus text format by
+prometheus_text() or passed to sinks registered by add_sink() on flush().
+"""
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left
+from contextlib import ContextDecorator
+from time import perf_counter
+from config.config import conf
+
+ENABLED = conf.get('metrics_params', 'enabled', fallback='0') == '1'
+
+# upper bounds of histogram buckets in seconds, 100 ns to 10 s
+BOUNDS = tuple(float(f'{base}e{power}') for power in range(-7, 1) for base in (1, 2.5, 5)) + (10.0,)
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_sinks = []
+
+
+class Histogram:
+    """Latency histogram with fixed buckets"""
+
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)  # last bucket is for values above BOUNDS
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Estimates quantile by linear interpolation inside the bucket it falls into"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BOUNDS[index - 1] if index else 0.0
+                upper = BOUNDS[index] if index < len(BOUNDS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+
+def enable(flag=True):
+    global ENABLED
+    ENABLED = flag
+
+
+def inc(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name, seconds):
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+
+class timed(ContextDecorator):
+    """Records duration of a block or a function call, usable as context manager and decorator
+
+        @metrics.timed('calc.on_enter')
+        def on_enter(self, event):
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def _recreate_cm(self):
+        # decorated function gets new timer on every call, so calls may nest or run in threads
+        return timed(self.name)
+
+    def __enter__(self):
+        self.start = perf_counter() if ENABLED else None
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self.start is not None:
+            observe(self.name, perf_counter() - self.start)
+            if exc_type is not None:
+                inc(f'{self.name}.errors')
+        return False
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def snapshot():
+    """Returns copy of collected values
+    :return: - {'counters': {name: value}, 'histograms': {name: {'count', 'sum', 'max', 'p50', 'p99', 'buckets'}}},
+    buckets are cumulative counts for upper bounds of BOUNDS and inf
+    """
+    with _lock:
+        histograms = {}
+        for name, histogram in _histograms.items():
+            cumulative = []
+            total = 0
+            for count in histogram.counts:
+                total += count
+                cumulative.append(total)
+            histograms[name] = {'count': histogram.count, 'sum': histogram.sum, 'max': histogram.max,
+                                'p50': histogram.quantile(0.5), 'p99': histogram.quantile(0.99),
+                                'buckets': cumulative}
+        return {'counters': dict(_counters), 'histograms': histograms}
+
+
+def prometheus_text(data=None):
+    """Renders snapshot in Prometheus text exposition format"""
+    data = snapshot() if data is None else data
+    lines = ['# TYPE calc_events_total counter']
+    for name, value in sorted(data['counters'].items()):
+        lines.append(f'calc_events_total{{event="{name}"}} {value}')
+    lines.append('# TYPE calc_stage_seconds histogram')
+    for name, histogram in sorted(data['histograms'].items()):
+        for bound, count in zip(BOUNDS + ('+Inf',), histogram['buckets']):
+            lines.append(f'calc_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+        lines.append(f'calc_stage_seconds_sum{{stage="{name}"}} {histogram["sum"]!r}')
+        lines.append(f'calc_stage_seconds_count{{stage="{name}"}} {histogram["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def add_sink(sink):
+    """Registers callable which gets snapshot on every flush()"""
+    _sinks.append(sink)
+
+
+def remove_sink(sink):
+    _sinks.remove(sink)
+
+
+def flush():
+    if _sinks:
+        data = snapshot()
+        for sink in _sinks:
+            sink(data)
+
+
+class LogSink:
+    """Writes snapshot as one JSON line to logger"""
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = level
+
+    def __call__(self, data):
+        self.logger.log(self.level, "metrics %s", json.dumps(data))
+
+
+class PrometheusFileSink:
+    """Rewrites file in Prometheus text format, e.g. for node exporter textfile collector"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, data):
+        # written aside and renamed, so readers never see half of the file
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as file:
+            file.write(prometheus_text(data))
+        os.replace(self.path + '.tmp', self.path)
@@ -0,0 +1,115 @@
+import numpy as np
+
+
+def find_roots(func, lo, hi, samples=100000, derivative=None, xtol=1e-12):
+    """Finds all real roots of function in the interval
+    Sign changes on a uniform grid are found in one vectorized pass and refined with
+    Brent's method, local minima of |f| without sign change (even roots) are refined
+    with Newton's method if derivative is given.
+    :param func: - vectorized function of one argument, e.g. made by sympy.lambdify
+    :param lo: - left end of the interval
+    :param hi: - right end of the interval
+    :param samples: - number of grid points
+    :param derivative: - vectorized derivative of func
+    :param xtol: - absolute tolerance of roots
+    :return: - sorted list of roots
+    """
+    x = np.linspace(lo, hi, samples)
+    with np.errstate(all='ignore'):
+        y = np.broadcast_to(np.real_if_close(np.asarray(func(x))), x.shape)
+    if np.iscomplexobj(y):
+        y = np.where(np.abs(y.imag) < 1e-12, y.real, np.nan)
+    y = y.astype(float)
+    finite = np.isfinite(y)
+
+    roots = list(x[finite & (y == 0)])
+
+    sign = np.sign(y)
+    brackets = np.nonzero((sign[:-1] * sign[1:] < 0) & finite[:-1] & finite[1:])[0]
+    for i in brackets:
+        root = brent(func, x[i], x[i + 1], y[i], y[i + 1], xtol)
+        # poles also change sign, value there is not smaller than on the grid
+        if abs(_value(func, root)) <= min(abs(y[i]), abs(y[i + 1])):
+            roots.append(root)
+
+    if derivative is not None:
+        absy = np.abs(y)
+        minima = np.nonzero((absy[1:-1] < absy[:-2]) & (absy[1:-1] <= absy[2:]) &
+                            (sign[:-2] == sign[1:-1]) & (sign[1:-1] == sign[2:]) & finite[1:-1])[0] + 1
+        for i in minima:
+            root = newton(func, derivative, x[i], x[i - 1], x[i + 1], xtol)
+            if root is not None:
+                roots.append(root)
+
+    roots.sort()
+    unique = []
+    for root in roots:
+        if not unique or root - unique[-1] > max(xtol, 1e-9 * abs(root)) * 10:
+            unique.append(float(root))
+    return unique
+
+
+def _value(func, x):
+    with np.errstate(all='ignore'):
+        value = complex(func(x))
+    return value.real if abs(value.imag) < 1e-12 else np.nan
+
+
+def brent(func, a, b, fa, fb, xtol=1e-12, maxiter=100):
+    """Brent's method for root of func bracketed by [a, b], fa and fb are of different signs"""
+    c, fc = b, fb
+    d = e = b - a
+    for _ in range(maxiter):
+        if (fb > 0) == (fc > 0):
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        tol = 2 * np.finfo(float).eps * abs(b) + xtol / 2
+        m = (c - b) / 2
+        if abs(m) <= tol or fb == 0:
+            return b
+        if abs(e) >= tol and abs(fa) > abs(fb):
+            # inverse quadratic interpolation or secant step
+            s = fb / fa
+            if a == c:
+                p = 2 * m * s
+                q = 1 - s
+            else:
+                q = fa / fc
+                r = fb / fc
+                p = s * (2 * m * q * (q - r) - (b - a) * (r - 1))
+                q = (q - 1) * (r - 1) * (s - 1)
+            if p > 0:
+                q = -q
+            p = abs(p)
+            if 2 * p < min(3 * m * q - abs(tol * q), abs(e * q)):
+                e, d = d, p / q
+            else:
+                d = e = m
+        else:
+            d = e = m
+        a, fa = b, fb
+        b += d if abs(d) > tol else (tol if m > 0 else -tol)
+        fb = _value(func, b)
+    return b
+
+
+def newton(func, derivative, x0, lo, hi, xtol=1e-12, maxiter=100):
+    """Newton's method started at x0, returns None if it leaves [lo, hi] or doesn't converge to zero"""
+    x = x0
+    for _ in range(maxiter):
+        fx = _value(func, x)
+        dfx = _value(derivative, x)
+        if fx == 0:
+            return x
+        if not np.isfinite(fx) or not np.isfinite(dfx) or dfx == 0:
+            return None
+        step = fx / dfx
+        x -= step
+        if not lo <= x <= hi:
+            return None
+        if abs(step) <= xtol:
+            return x if abs(_value(func, x)) < 1e-9 else None
+    return None
@@ -0,0 +1,232 @@
+"""Ordinary differential equations typed as text
+
+Equations and initial conditions are separated by ';', derivatives are written with
+primes and x is the independent variable, e.g. "y'' + y; y(0) = 1; y'(0) = 0" or
+system "y' - z; z' + y; y(0) = 1; z(0) = 0". Each equation is its left part, '= 0'
+is implied unless '=' is given.
+"""
+import re
+import numpy as np
+from calc.errors import InvalidInputError
+from config.config import conf
+
+_derivative = re.compile(r"\b([A-Za-z_]\w*)('+)")
+_condition = re.compile(r"^\s*([A-Za-z_]\w*)('*)\s*\((.+)\)\s*=(.+)$")
+
+# Dormand-Prince 5(4) coefficients
+_C = np.array([0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1, 1])
+_A = [
+    np.array([]),
+    np.array([1 / 5]),
+    np.array([3 / 40, 9 / 40]),
+    np.array([44 / 45, -56 / 15, 32 / 9]),
+    np.array([19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729]),
+    np.array([9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656]),
+    np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84]),
+]
+_B = np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0])
+_E = np.array([71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40])
+
+
+class OdeSolution:
+    """Numeric solution sampled at integrator steps with dense output between them
+    t - array of steps, shape (n,)
+    y - states at steps, shape (n, m)
+    dy - derivatives at steps, shape (n, m)
+    names - names of state components, e.g. ['y', "y'"]
+    """
+
+    def __init__(self, t, y, dy, names):
+        self.t = t
+        self.y = y
+        self.dy = dy
+        self.names = names
+
+    def __call__(self, t):
+        """Cubic Hermite interpolation of the states
+        :param t: - scalar or array of points inside the integrated interval
+        :return: - states, shape (m,) or (len(t), m)
+        """
+        t = np.asarray(t, dtype=float)
+        i = np.clip(np.searchsorted(self.t, t, side='right') - 1, 0, len(self.t) - 2)
+        h = (self.t[i + 1] - self.t[i])[..., None]
+        s = ((t - self.t[i])[..., None]) / h
+        h00 = (1 + 2 * s) * (1 - s) ** 2
+        h10 = s * (1 - s) ** 2
+        h01 = s ** 2 * (3 - 2 * s)
+        h11 = s ** 2 * (s - 1)
+        return h00 * self.y[i] + h10 * h * self.dy[i] + h01 * self.y[i + 1] + h11 * h * self.dy[i + 1]
+
+    def sample(self, n):
+        """Returns n evenly spaced points and states at them"""
+        t = np.linspace(self.t[0], self.t[-1], n)
+        return t, self(t)
+
+    def export(self, path, n=None):
+        """Writes solution as CSV, integrator steps or n evenly spaced points"""
+        t, y = (self.t, self.y) if n is None else self.sample(n)
+        np.savetxt(path, np.column_stack([t, y]), delimiter=',', header=','.join(['x'] + self.names), comments='')
+
+    def __str__(self):
+        values = ', '.join(f"{name}({self.t[-1]:g}) ≈ {value:.10g}" for name, value in zip(self.names, self.y[-1]))
+        return f"{values} ({len(self.t) - 1} steps)"
+
+
+def rk45(func, t0, t1, y0, rtol=1e-6, atol=1e-9, max_steps=1000000):
+    """Adaptive Dormand-Prince integrator
+    :param func: - right part f(t, y) of system y' = f(t, y), y is numpy array
+    :param t0: - start of integration
+    :param t1: - end of integration, may be less than t0
+    :param y0: - initial state
+    :return: - OdeSolution with unnamed components
+    """
+    y = np.asarray(y0, dtype=float)
+    direction = 1.0 if t1 >= t0 else -1.0
+    f = np.asarray(func(t0, y), dtype=float)
+
+    scale = atol + rtol * np.abs(y)
+    d0, d1 = _norm(y / scale), _norm(f / scale)
+    h = 1e-6 if d0 < 1e-5 or d1 < 1e-5 else 0.01 * d0 / d1
+    h = min(h, abs(t1 - t0))
+
+    ts, ys, dys = [t0], [y], [f]
+    k = np.empty((7, y.size))
+    t = t0
+    for _ in range(max_steps):
+        if direction * (t1 - t) <= 0:
+            break
+        h = min(h, abs(t1 - t))
+        step = direction * h
+        k[0] = f
+        for i in range(1, 7):
+            k[i] = func(t + _C[i] * step, y + step * (_A[i] @ k[:i]))
+        y_new = y + step * (_B @ k)
+        error = _norm(step * (_E @ k) / (atol + rtol * np.maximum(np.abs(y), np.abs(y_new))))
+        if error <= 1:
+            t += step
+            y = y_new
+            f = k[6].copy()  # first same as last
+            ts.append(t)
+            ys.append(y)
+            dys.append(f)
+        h *= min(10.0, max(0.2, 0.9 * error ** -0.2)) if error > 0 else 10.0
+        if h < 1e-14 * max(1.0, abs(t)):
+            raise ArithmeticError(f"step size became too small at x = {t:g}")
+    else:
+        raise ArithmeticError("too many steps")
+    return OdeSolution(np.array(ts), np.array(ys), np.array(dys), [str(i) for i in range(y.size)])
+
+
+def _norm(x):
+    return np.sqrt(np.mean(x * x))
+
+
+def parse(text):
+    """Parses equations and initial conditions
+    :return: - (equations, functions, x, conditions), conditions map (name, order) to (x0, value)
+    """
+    import sympy
+    from calc.calc import normalize_equation
+    x = sympy.Symbol('x')
+    parts = [part for part in normalize_equation(text).split(';') if part.strip()]
+    names = sorted({name for name, _ in _derivative.findall(';'.join(parts)) if name != 'x'})
+    if not names:
+        raise InvalidInputError("invalid input: no derivative like y' in the equation")
+    functions = {name: sympy.Function(name)(x) for name in names}
+
+    equations = []
+    conditions = {}
+    for part in parts:
+        match = _condition.match(part)
+        if match and match.group(1) in functions:
+            name, primes, x0, value = match.groups()
+            conditions[(name, len(primes))] = (_sympify(x0), _sympify(value))
+            continue
+        text = _derivative.sub(lambda m: f"Derivative({m.group(1)}(x), x, {len(m.group(2))})", part)
+        text = re.sub(r"\b(%s)\b(?!\s*\()" % '|'.join(names), r"\1(x)", text)
+        left, _, right = text.partition('=')
+        equations.append(_sympify(left, functions) - (_sympify(right, functions) if right else 0))
+    if not equations:
+        raise InvalidInputError("invalid input: no equation")
+    return equations, functions, x, conditions
+
+
+def _sympify(text, functions=None):
+    import sympy
+    namespace = {name: type(func) for name, func in (functions or {}).items()}
+    try:
+        return sympy.sympify(text, locals=namespace)
+    except (sympy.SympifyError, SyntaxError, TypeError) as error:
+        raise InvalidInputError(f"invalid input: {error}") from None
+
+
+def solve_symbolic(text):
+    """Solves equations with sympy.dsolve, initial conditions are used if given"""
+    import sympy
+    equations, functions, x, conditions = parse(text)
+    ics = {}
+    for (name, order), (x0, value) in conditions.items():
+        func = functions[name]
+        ics[func.diff(x, order).subs(x, x0) if order else func.subs(x, x0)] = value
+    if len(equations) == 1:
+        return sympy.dsolve(equations[0], list(functions.values())[0], ics=ics or None)
+    return sympy.dsolve(equations, list(functions.values()), ics=ics or None)
+
+
+def solve_numeric(text, span=None):
+    """Integrates equations from the point of initial conditions with rk45
+    :param text: - equations with initial conditions for every function and derivative below the highest one
+    :param span: - length of integration interval, config.ini value by default
+    :return: - OdeSolution
+    """
+    import sympy
+    equations, functions, x, conditions = parse(text)
+    span = float(conf.get('equ_params', 'ode_span', fallback='10')) if span is None else span
+
+    orders = {name: max([d.derivative_count for d in sympy.Add(*equations).atoms(sympy.Derivative)
+                         if d.expr == func] or [0]) for name, func in functions.items()}
+    highest = [functions[name].diff(x, order) for name, order in orders.items()]
+    try:
+        rhs = sympy.solve(equations, highest, dict=True)
+    except NotImplementedError:
+        rhs = []
+    if len(rhs) != 1:
+        raise InvalidInputError("equations can't be resolved for the highest derivatives")
+    rhs = rhs[0]
+
+    # state is y, y', ..., y^(n-1) of every function
+    names, symbols, replacements, y0, points = [], [], {}, [], set()
+    for name, order in orders.items():
+        for i in range(order):
+            key = (name, i)
+            if key not in conditions:
+                raise InvalidInputError(f"initial condition {name}{chr(39) * i}(x0) is required for numeric solve")
+            x0, value = conditions[key]
+            points.add(x0)
+            y0.append(float(value))
+            symbol = sympy.Symbol(f"_{name}_{i}")
+            names.append(name + "'" * i)
+            symbols.append(symbol)
+            replacements[functions[name].diff(x, i) if i else functions[name]] = symbol
+    if len(points) != 1:
+        raise InvalidInputError("initial conditions must be given at one point")
+
+    def substitute(expr):
+        # highest derivatives go first, so y(x) is not replaced inside of them
+        for key in sorted(replacements, key=lambda k: -getattr(k, 'derivative_count', 0)):
+            expr = expr.subs(key, replacements[key])
+        return expr
+
+    derivatives = []
+    for name, order in orders.items():
+        derivatives.extend(symbols[names.index(name + "'" * i)] for i in range(1, order))
+        derivatives.append(substitute(rhs[functions[name].diff(x, order)]))
+    right = sympy.lambdify((x, symbols), derivatives, 'numpy')
+
+    def func(t, y):
+        return np.array([np.broadcast_to(value, ()) for value in right(t, y)], dtype=float)
+
+    x0 = float(points.pop())
+    solution = rk45(func, x0, x0 + span, y0)
+    solution.names = names
+    return solution
@@ -0,0 +1,115 @@
+import numpy as np
+from calc.vector import compile_array
+
+
+def compile_function(formula):
+    """Compiles formula of y = f(x) to vectorized function of numpy array"""
+    code = compile_array(formula)
+    unknown = code.variables - {'x'}
+    if unknown:
+        raise ValueError(f"unknown names: {', '.join(sorted(unknown))}")
+
+    def func(x):
+        with np.errstate(all='ignore'):
+            y = np.asarray(code.evaluate({'x': x}), dtype=float)
+        return np.broadcast_to(y, x.shape)
+
+    return func
+
+
+def adaptive_sample(func, lo, hi, points, tol, max_depth=8, max_points=1000000):
+    """Samples function on uniform grid and adds midpoints only where curvature is high
+    :param func: - vectorized function
+    :param lo: - left end of the range
+    :param hi: - right end of the range
+    :param points: - number of points of uniform grid
+    :param tol: - allowed distance between function and chord in the middle of segment
+    :param max_depth: - maximum number of halvings of grid step
+    :param max_points: - maximum number of points
+    :return: - sorted arrays x, y
+    """
+    x = np.linspace(lo, hi, max(points, 2))
+    y = func(x)
+    for _ in range(max_depth):
+        mid = (x[:-1] + x[1:]) / 2
+        # flag segments around points where second difference is large
+        curved = np.zeros(len(mid), dtype=bool)
+        second = np.abs(y[:-2] - 2 * y[1:-1] + y[2:])
+        bent = (second > tol) | ~np.isfinite(second)
+        curved[:-1] |= bent
+        curved[1:] |= bent
+        if not curved.any() or len(x) + curved.sum() > max_points:
+            break
+        mid = mid[curved]
+        x = np.concatenate([x, mid])
+        y = np.concatenate([y, func(mid)])
+        order = np.argsort(x, kind='stable')
+        x, y = x[order], y[order]
+    return x, y
+
+
+def downsample(x, y, lo, hi, width):
+    """Reduces sorted samples to pixel resolution, first, min, max and last point of every pixel column
+    are kept, so the drawn line looks the same. NaN values are kept as gaps.
+    :return: - arrays x, y
+    """
+    if len(x) <= 4 * width:
+        return x, y
+    column = np.clip(((x - lo) / (hi - lo) * width).astype(np.int64), 0, width - 1)
+    starts = np.flatnonzero(np.diff(column, prepend=-1))
+    ends = np.append(starts[1:], len(x)) - 1
+    with np.errstate(all='ignore'):
+        ymin = np.fmin.reduceat(y, starts)
+        ymax = np.fmax.reduceat(y, starts)
+    gap = np.logical_or.reduceat(np.isnan(y), starts)
+    xs = np.column_stack([x[starts], x[starts], x[starts], x[ends]]).ravel()
+    ys = np.column_stack([y[starts], ymin, ymax, y[ends]]).ravel()
+    # a column with NaN inside is split by the gap instead of being joined over it
+    ys.reshape(-1, 4)[gap, 1:3] = np.nan
+    return xs, ys
+
+
+class FunctionSampler:
+    """Keeps samples of one function, so panning evaluates only newly visible range"""
+
+    def __init__(self, func, oversample=4, max_depth=8, max_points=1000000):
+        self.func = func
+        self.oversample = oversample
+        self.max_depth = max_depth
+        self.max_points = max_points
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+        self.step = None
+
+    def samples(self, lo, hi, width, tol):
+        """Returns samples of [lo, hi] reduced to width pixel columns
+        :param tol: - curvature tolerance in units of y, usually height of one pixel
+        """
+        step = (hi - lo) / (width * self.oversample)
+        cached = len(self.x) and self.x[0] < hi and self.x[-1] > lo
+        if not cached or step < self.step / 2 or step > self.step * 2:
+            # zoom changes resolution, the whole range is sampled again
+            self.step = step
+            self.x, self.y = self._sample(lo, hi, tol)
+        else:
+            parts_x, parts_y = [self.x], [self.y]
+            if lo < self.x[0]:
+                x, y = self._sample(lo, self.x[0], tol)
+                parts_x.insert(0, x[:-1])
+                parts_y.insert(0, y[:-1])
+            if hi > self.x[-1]:
+                x, y = self._sample(self.x[-1], hi, tol)
+                parts_x.append(x[1:])
+                parts_y.append(y[1:])
+            self.x, self.y = np.concatenate(parts_x), np.concatenate(parts_y)
+            # samples far out of view are dropped to keep memory bounded
+            span = hi - lo
+            keep = slice(np.searchsorted(self.x, lo - 2 * span), np.searchsorted(self.x, hi + 2 * span))
+            self.x, self.y = self.x[keep], self.y[keep]
+
+        view = slice(max(np.searchsorted(self.x, lo) - 1, 0), np.searchsorted(self.x, hi) + 1)
+        return downsample(self.x[view], self.y[view], lo, hi, width)
+
+    def _sample(self, lo, hi, tol):
+        points = int(np.ceil((hi - lo) / self.step)) + 1
+        return adaptive_sample(self.func, lo, hi, points, tol, self.max_depth, self.max_points)
@@ -0,0 +1,175 @@
+"""Numeric roots of polynomials
+
+Polynomial equations are recognized from the syntax tree, coefficients are collected once
+and all roots, complex ones too, are eigenvalues of the companion matrix, refined by a few
+Newton steps. Many polynomials of the same degree are solved at once from stacked
+coefficients, e.g. for a sweep of a parameter:
+
+    c = np.stack([np.ones(n), np.zeros(n), -np.linspace(1, 2, n)], axis=1)  # x^2 - a
+    roots_batch(c)  ->  complex array of shape (n, 2)
+"""
+import ast
+import math
+from functools import lru_cache
+import numpy as np
+
+# constants allowed in coefficients, the same as sympy has, to which 'e' is a plain unknown
+CONSTANTS = {'pi': math.pi, 'E': math.e}
+
+# powers above it are not expanded, such equations are left to sympy
+MAX_DEGREE = 1000
+
+NEWTON_STEPS = 3
+
+
+class _NotPolynomial(Exception):
+    pass
+
+
+def _add(a, b):
+    if len(a) < len(b):
+        a, b = b, a
+    return [value + (b[i] if i < len(b) else 0.0) for i, value in enumerate(a)]
+
+
+def _mul(a, b):
+    product = [0.0] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        if x:
+            for j, y in enumerate(b):
+                product[i + j] += x * y
+    return product
+
+
+@lru_cache(maxsize=256)
+def _is_symbol(name):
+    """True if sympy parses name as plain unknown, not e.g. I, oo, S or a function"""
+    from sympy import Symbol, SympifyError, sympify
+    try:
+        return isinstance(sympify(name), Symbol)
+    except (SympifyError, SyntaxError, TypeError, ValueError):
+        return False
+
+
+class _Collector:
+    """Coefficients of expression in one unknown, lowest power first"""
+
+    def __init__(self):
+        self.name = None
+
+    def visit(self, node):
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return [float(node.value)]
+        if isinstance(node, ast.Name):
+            if node.id in CONSTANTS:
+                return [CONSTANTS[node.id]]
+            if self.name not in (None, node.id) or not _is_symbol(node.id):
+                raise _NotPolynomial  # more than one unknown or a name with meaning in sympy
+            self.name = node.id
+            return [0.0, 1.0]
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+            operand = self.visit(node.operand)
+            return operand if isinstance(node.op, ast.UAdd) else [-value for value in operand]
+        if isinstance(node, ast.BinOp):
+            left, right = self.visit(node.left), self.visit(node.right)
+            if isinstance(node.op, ast.Add):
+                return _add(left, right)
+            if isinstance(node.op, ast.Sub):
+                return _add(left, [-value for value in right])
+            if isinstance(node.op, ast.Mult):
+                if len(left) + len(right) - 2 > MAX_DEGREE:
+                    raise _NotPolynomial
+                return _mul(left, right)
+            if isinstance(node.op, ast.Div) and len(right) == 1 and right[0] != 0:
+                return [value / right[0] for value in left]
+            if isinstance(node.op, ast.Pow) and len(right) == 1 and right[0] >= 0 and right[0].is_integer() \
+                    and (len(left) - 1) * right[0] <= MAX_DEGREE:
+                power, exponent = [1.0], int(right[0])
+                while exponent:
+                    if exponent & 1:
+                        power = _mul(power, left)
+                    exponent >>= 1
+                    if exponent:
+                        left = _mul(left, left)
+                return power
+        raise _NotPolynomial
+
+
+def coefficients(equ):
+    """Returns (unknown, coefficients from the highest power) of polynomial equation 'equ = 0'
+    or None if it is not a polynomial with numeric coefficients in one unknown
+    :param equ: - normalized equation, see calc.normalize_equation
+    """
+    try:
+        tree = ast.parse(equ.strip(), mode='eval')
+        collector = _Collector()
+        coeffs = collector.visit(tree.body)
+    except (SyntaxError, _NotPolynomial, OverflowError):
+        return None
+    if collector.name is None or not all(math.isfinite(value) for value in coeffs):
+        return None
+    while len(coeffs) > 1 and coeffs[-1] == 0:
+        coeffs.pop()  # terms cancelled, e.g. x^2 - x^2 + x
+    return collector.name, coeffs[::-1]
+
+
+def _evaluate(coeffs, x):
+    """Values of stacked polynomials and their derivatives at stacked points, Horner's scheme"""
+    value = np.broadcast_to(coeffs[:, :1], x.shape).astype(complex)
+    slope = np.zeros_like(value)
+    for i in range(1, coeffs.shape[1]):
+        slope = slope * x + value
+        value = value * x + coeffs[:, i:i + 1]
+    return value, slope
+
+
+def roots_batch(coeffs, polish=True):
+    """Roots of many polynomials of the same degree in one vectorized pass
+    :param coeffs: - array of shape (k, n + 1), coefficients from the highest power, or one polynomial
+    :param polish: - refine eigenvalues by Newton steps on the original coefficients
+    :return: - complex array of shape (k, n) of roots sorted by real then imaginary part,
+    rows with zero leading coefficient are NaN
+    """
+    coeffs = np.asarray(coeffs, dtype=float)
+    if coeffs.ndim == 1:
+        coeffs = coeffs[None, :]
+    k, n = coeffs.shape[0], coeffs.shape[1] - 1
+    if n < 1:
+        return np.empty((k, 0), dtype=complex)
+    valid = coeffs[:, 0] != 0
+    lead = np.where(valid, coeffs[:, 0], 1.0)
+
+    companion = np.zeros((k, n, n))
+    companion[:, 0, :] = -coeffs[:, 1:] / lead[:, None]
+    companion[:, np.arange(1, n), np.arange(n - 1)] = 1.0
+    with np.errstate(all='ignore'):
+        roots = np.linalg.eigvals(np.where(np.isfinite(companion), companion, 0.0)).astype(complex)
+
+        if polish:
+            value, slope = _evaluate(coeffs, roots)
+            for _ in range(NEWTON_STEPS):
+                step = np.where(slope != 0, value / np.where(slope != 0, slope, 1), 0)
+                candidate = roots - step
+                candidate_value, candidate_slope = _evaluate(coeffs, candidate)
+                # steps near multiple roots can go astray, only improving ones are kept
+                better = np.abs(candidate_value) < np.abs(value)
+                roots = np.where(better, candidate, roots)
+                value = np.where(better, candidate_value, value)
+                slope = np.where(better, candidate_slope, slope)
+
+    scale = np.maximum(np.abs(roots), 1.0)
+    roots = np.where(np.abs(roots.imag) <= 1e-10 * scale, roots.real + 0j, roots)
+    roots[~valid] = np.nan
+    return np.sort(roots, axis=1)
+
+
+def roots(coeffs, polish=True):
+    """Roots of one polynomial, real ones as floats, complex ones as complex
+    :param coeffs: - coefficients from the highest power, leading zeros are ignored
+    """
+    coeffs = list(coeffs)
+    while coeffs and coeffs[0] == 0:
+        coeffs.pop(0)
+    if len(coeffs) < 2:
+        return []
+    return [float(root.real) if root.imag == 0 else complex(root) for root in roots_batch(coeffs, polish)[0]]
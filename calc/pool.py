@@ -0,0 +1,95 @@
+import multiprocessing
+import threading
+
+
+def _warm_up():
+    # sympy takes seconds to import, worker pays it before the first task comes,
+    # together with first use of the solvers, which is a few tenths of a second more
+    import sympy
+    from calc import calc, numeric  # noqa: F401
+    x = sympy.Symbol('x')
+    sympy.lambdify(x, sympy.diff(x ** 2, x), 'numpy')
+
+
+class SolvePool:
+    """Runs tasks in worker process, so callers are never blocked by long sympy solves
+
+    Only the latest task matters: new submission supersedes the running one by
+    terminating the worker, results of stale tasks are never delivered. A warm spare
+    pool replaces the terminated one at once, so the next task doesn't wait for a new
+    process to start and import sympy.
+    """
+
+    def __init__(self, dispatch=None, processes=1, spare=True):
+        """
+        :param dispatch: - function calling callback on the right thread, e.g. wx.CallAfter
+        :param processes: - number of worker processes
+        :param spare: - keep a second warm pool to replace cancelled one
+        """
+        self.dispatch = dispatch
+        self.processes = processes
+        self.spare = spare
+        self.ticket = 0
+        self.busy = False
+        self._pool = None
+        self._spare = None
+
+    def _new_pool(self):
+        # spawn doesn't copy GUI state of parent process into workers
+        return multiprocessing.get_context('spawn').Pool(self.processes, initializer=_warm_up)
+
+    def start(self):
+        if self._pool is None:
+            self._pool = self._spare if self._spare is not None else self._new_pool()
+            self._spare = None
+        if self.spare and self._spare is None:
+            self._spare = self._new_pool()
+
+    def submit(self, func, args, on_done, on_error):
+        """Runs func(*args) in worker process
+        :param on_done: - called with result of func
+        :param on_error: - called with exception raised by func
+        :return: - ticket of the task
+        """
+        if self.busy:
+            self.cancel()
+        self.start()
+        self.ticket += 1
+        ticket = self.ticket
+        self.busy = True
+        self._pool.apply_async(func, args,
+                               callback=lambda result: self._deliver(ticket, on_done, result),
+                               error_callback=lambda error: self._deliver(ticket, on_error, error))
+        return ticket
+
+    def is_current(self, ticket):
+        return self.busy and ticket == self.ticket
+
+    def _deliver(self, ticket, callback, value):
+        # runs in result handler thread of the pool
+        if self.dispatch is None:
+            self._finish(ticket, callback, value)
+        else:
+            self.dispatch(self._finish, ticket, callback, value)
+
+    def _finish(self, ticket, callback, value):
+        if self.is_current(ticket):
+            self.busy = False
+            callback(value)
+
+    def cancel(self):
+        """Stops running task, spare pool takes over and the stuck one is terminated in background"""
+        self.ticket += 1
+        if self.busy and self._pool is not None:
+            stuck, self._pool = self._pool, None
+            threading.Thread(target=stuck.terminate, daemon=True).start()
+            self.start()
+        self.busy = False
+
+    def close(self):
+        self.ticket += 1
+        self.busy = False
+        for pool in (self._pool, self._spare):
+            if pool is not None:
+                pool.terminate()
+        self._pool = self._spare = None
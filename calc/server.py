@@ -0,0 +1,336 @@
+"""Local HTTP server of the calc engine
+
+    python -m calc.server [--host 127.0.0.1] [--port 8765] [--unix PATH] [--workers N]
+
+Endpoints, request and response bodies are JSON:
+    POST /evaluate  {"formula": "2^10"} or {"formulas": [...]}, optional "base": "dec|bin|hex",
+                    "backend": "float|decimal|fraction|mpmath"  ->  {"results": [{"value", "error"}, ...]}
+    POST /solve     {"equation": "x^2-1"} or {"equations": [...]}, optional "numeric": true
+                    ->  {"results": [{"value": [...], "error"}, ...]}
+    GET  /health    ->  {"status": "ok", "pending": N}
+    GET  /metrics   ->  Prometheus text of calc.metrics
+
+Arithmetic is evaluated in one thread off the event loop, compiled formulas are cached across
+requests, solves run in a process pool sized to the cores. Requests above the pending limit get 503,
+requests running longer than the timeout get 504, workers of timed out solves are killed.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from calc import calc, metrics
+from calc.backends import BACKENDS
+from calc.errors import CalcError
+from calc.pool import _warm_up
+from config.config import conf
+
+BASES = {'dec': None, 'bin': bin, 'hex': hex}
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 411: 'Length Required',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+# formulas evaluated by the evaluation thread in one go, so a big batch doesn't stall other requests
+CHUNK = 256
+
+
+class HttpError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_value(value):
+    """Numbers JSON has no type for, e.g. Fraction and Decimal, are sent as strings"""
+    if value is None or type(value) in (int, float, str, bool):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_json_value(item) for item in value]
+    return str(value)
+
+
+def _solve(equation, numeric):
+    # runs in worker process
+    if numeric:
+        return calc.solve_numeric(equation)
+    return _json_value(calc.solve_equation(equation))
+
+
+class Server:
+
+    def __init__(self, workers=None, max_pending=None, timeout=None, solve_timeout=None, max_body=None,
+                 max_batch=None):
+        """
+        :param workers: - processes of solve pool, number of cores by default
+        :param max_pending: - requests handled at once, more are rejected with 503
+        :param timeout: - seconds of evaluate request before 504
+        :param solve_timeout: - seconds of solve request before 504
+        :param max_body: - bytes of request body, larger ones are rejected with 413
+        :param max_batch: - formulas or equations in one request
+        """
+        def option(value, key, fallback, convert=int):
+            return convert(conf.get('server_params', key, fallback=fallback)) if value is None else value
+
+        self.workers = option(workers, 'workers', '0') or os.cpu_count() or 1
+        self.max_pending = option(max_pending, 'max_pending', '256')
+        self.timeout = option(timeout, 'timeout', '5', float)
+        self.solve_timeout = solve_timeout if solve_timeout is not None else \
+            float(conf.get('equ_params', 'solve_timeout', fallback='30'))
+        self.max_body = option(max_body, 'max_body', '1048576')
+        self.max_batch = option(max_batch, 'max_batch', '10000')
+        self.pending = 0
+        self.solving = 0  # solves still running in workers
+        self._executor = None
+        self._generation = 0  # incremented when solve pool is replaced
+        # one thread, so caches and metrics of calc are never used concurrently
+        self._evaluator = ThreadPoolExecutor(1, thread_name_prefix='evaluate')
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_warm_up)
+        return self._executor
+
+    def close(self):
+        self._evaluator.shutdown(wait=False, cancel_futures=True)
+        self.reset_solvers()
+
+    def reset_solvers(self):
+        """Kills solve workers, e.g. stuck in solve which timed out, pool is created again by next solve"""
+        if self._executor is not None:
+            # executor has no public way to stop running task, its processes are terminated directly
+            for process in list((getattr(self._executor, '_processes', None) or {}).values()):
+                process.terminate()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        # solves of killed workers never finish, their slots are released here
+        self._generation += 1
+        self.solving = 0
+
+    async def handle(self, reader, writer):
+        """Serves HTTP/1.1 connection, keep-alive requests are handled one after another"""
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except HttpError as error:
+                    await self.respond(writer, error.status, {'error': str(error)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, body, keep_alive = request
+                status, payload = await self.dispatch(method, path, body)
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        """Returns (method, path, body, keep_alive) or None if connection is closed"""
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, path, version = line.decode('latin-1').split()
+        except ValueError:
+            raise HttpError(400, "malformed request line") from None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = headers.get('content-length')
+        if length is None:
+            if method == 'POST':
+                raise HttpError(411, "Content-Length is required")
+            length = '0'
+        if not (length.isascii() and length.isdigit()):
+            raise HttpError(400, f"invalid Content-Length {length!r}")
+        length = int(length)
+        if length > self.max_body:
+            raise HttpError(413, f"body is larger than {self.max_body} bytes")
+        body = await reader.readexactly(length) if length else b''
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+        return method, path.split('?', 1)[0], body, keep_alive
+
+    async def respond(self, writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), 'text/plain; version=0.0.4'
+        else:
+            try:
+                body = json.dumps(payload).encode()
+            except (ValueError, TypeError) as error:  # e.g. int too long for str conversion
+                status, body = 500, json.dumps({'error': f"result can't be sent: {error}"}).encode()
+            content_type = 'application/json'
+        head = [f"HTTP/1.1 {status} {REASONS[status]}", f"Content-Type: {content_type}",
+                f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if status == 503:
+            head.append("Retry-After: 1")
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + body)
+        await writer.drain()
+
+    async def dispatch(self, method, path, body):
+        """Returns (status, payload) of request"""
+        routes = {'/evaluate': ('POST', self.evaluate), '/solve': ('POST', self.solve),
+                  '/health': ('GET', self.health), '/metrics': ('GET', self.metrics)}
+        if path not in routes:
+            return 404, {'error': f"unknown path {path}"}
+        allowed, handler = routes[path]
+        if method != allowed:
+            return 405, {'error': f"{path} accepts {allowed} only"}
+        if method == 'GET':
+            return 200, handler()
+        # backpressure: rejecting is cheaper for clients than waiting in an unbounded queue
+        if self.pending >= self.max_pending:
+            return 503, {'error': "server is busy"}
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError as error:  # also JSONDecodeError and UnicodeDecodeError
+            return 400, {'error': f"invalid JSON: {error}"}
+        if not isinstance(request, dict):
+            return 400, {'error': "request body must be JSON object"}
+        self.pending += 1
+        try:
+            return 200, await handler(request)
+        except HttpError as error:
+            return error.status, {'error': str(error)}
+        except asyncio.TimeoutError:
+            return 504, {'error': "request timed out"}
+        finally:
+            self.pending -= 1
+
+    def items(self, request, one, many):
+        """Returns batch of the request, either single item or list"""
+        if many in request:
+            items = request[many]
+            if not isinstance(items, list) or not all(isinstance(item, str) for item in items):
+                raise HttpError(400, f"{many} must be list of strings")
+        elif isinstance(request.get(one), str):
+            items = [request[one]]
+        else:
+            raise HttpError(400, f"request needs {one} or {many}")
+        if len(items) > self.max_batch:
+            raise HttpError(413, f"batch is larger than {self.max_batch}")
+        return items
+
+    async def evaluate(self, request):
+        formulas = self.items(request, 'formula', 'formulas')
+        if request.get('base', 'dec') not in BASES:
+            raise HttpError(400, f"base must be one of {', '.join(BASES)}")
+        if request.get('backend') not in BACKENDS + (None,):
+            raise HttpError(400, f"backend must be one of {', '.join(BACKENDS)}")
+        base, backend = BASES[request.get('base', 'dec')], request.get('backend')
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        results = []
+        for start in range(0, len(formulas), CHUNK):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            # slow formula holds the evaluation thread, but the loop keeps serving and the deadline applies
+            chunk = loop.run_in_executor(self._evaluator, functools.partial(
+                calc.evaluate_many, formulas[start:start + CHUNK], base, backend, store=True))
+            for result in await asyncio.wait_for(chunk, remaining):
+                results.append({'value': _json_value(result.value), 'error': result.error})
+        return {'results': results}
+
+    async def solve(self, request):
+        equations = self.items(request, 'equation', 'equations')
+        numeric = bool(request.get('numeric', False))
+        if self.solving + len(equations) > self.workers * 4:
+            raise HttpError(503, "solve pool is busy")
+        loop = asyncio.get_running_loop()
+        futures = []
+        for equation in equations:
+            try:
+                future = loop.run_in_executor(self.executor, _solve, equation, numeric)
+            except BrokenProcessPool:
+                # idle worker was killed since the last solve
+                self.reset_solvers()
+                future = loop.run_in_executor(self.executor, _solve, equation, numeric)
+            # worker can't be interrupted, its slot is counted until it finishes or the pool is replaced
+            self.solving += 1
+            future.add_done_callback(functools.partial(self._solved, self._generation))
+            futures.append(future)
+        generation = self._generation
+        try:
+            outcomes = await asyncio.wait_for(asyncio.gather(*[asyncio.shield(future) for future in futures],
+                                                             return_exceptions=True), self.solve_timeout)
+        except asyncio.TimeoutError:
+            # sympy solve can run for hours, workers are killed so they don't stay stuck in it
+            self.reset_solvers()
+            raise
+        results = []
+        for outcome in outcomes:
+            if isinstance(outcome, (CalcError, NotImplementedError, ValueError, TypeError, ArithmeticError)):
+                results.append({'value': None, 'error': str(outcome) or type(outcome).__name__})
+            elif isinstance(outcome, BrokenProcessPool):
+                # worker was killed, e.g. by running out of memory, pool is replaced for next requests
+                if generation == self._generation:  # unless other request has already done it
+                    self.reset_solvers()
+                raise HttpError(503, "solve worker crashed")
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                results.append({'value': outcome, 'error': None})
+        return {'results': results}
+
+    def _solved(self, generation, future):
+        if not future.cancelled():
+            future.exception()  # retrieved, solve of killed worker may not be awaited by anyone
+        if generation == self._generation:
+            self.solving -= 1
+
+    def health(self):
+        return {'status': 'ok', 'pending': self.pending, 'solving': self.solving}
+
+    def metrics(self):
+        return metrics.prometheus_text()
+
+
+async def serve(server, host=None, port=None, unix=None):
+    """Serves until cancelled, on Unix socket if unix path is given"""
+    if unix is not None:
+        listener = await asyncio.start_unix_server(server.handle, unix)
+    else:
+        listener = await asyncio.start_server(server.handle, host, port)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+        if unix is not None and os.path.exists(unix):
+            os.unlink(unix)
+
+
+def main(argv=None):
+    args_parser = argparse.ArgumentParser(prog='python -m calc.server', description='Serves calc engine over HTTP.')
+    args_parser.add_argument('--host', default=conf.get('server_params', 'host', fallback='127.0.0.1'))
+    args_parser.add_argument('--port', type=int, default=int(conf.get('server_params', 'port', fallback='8765')))
+    args_parser.add_argument('--unix', help="path of Unix socket to listen on instead of TCP")
+    args_parser.add_argument('--workers', type=int, help="solve processes, number of cores by default")
+    args = args_parser.parse_args(argv)
+
+    server = Server(workers=args.workers)
+    where = args.unix or f"http://{args.host}:{args.port}"
+    print(f"serving on {where} with {server.workers} solve workers", file=sys.stderr)
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,305 @@
+import json
+import os
+import re
+from array import array
+from decimal import Decimal
+from fractions import Fraction
+from calc.backends import get_backend
+from calc.cache import LRUCache
+from calc.calc import compile_source, run_compiled, format_result
+from calc.errors import CalcError, InvalidInputError, BaseConversionError
+from config.config import conf
+
+_assignment = re.compile(r'^\s*([A-Za-z_]\w*)\s*=(?!=)(.*)$')
+_history_ref = re.compile(r'^ans(\d+)$')
+_ans = re.compile(r'\bans\b')
+
+
+class HistoryRing:
+    """Last results in fixed-size ring, floats are kept in array, other numbers aside of it
+    Entries are numbered from 1 through the whole session, old ones are overwritten.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.values = array('d', bytes(8 * capacity))
+        self.exact = {}  # slot -> int, Fraction, Decimal or mpf result
+        self.formulas = [None] * capacity
+        self.count = 0
+
+    def push(self, formula, value):
+        slot = self.count % self.capacity
+        if type(value) is float:
+            self.values[slot] = value
+            self.exact.pop(slot, None)
+        else:
+            self.exact[slot] = value
+        self.formulas[slot] = formula
+        self.count += 1
+        return self.count
+
+    def __contains__(self, number):
+        return max(self.count - self.capacity, 0) < number <= self.count
+
+    def __getitem__(self, number):
+        if number not in self:
+            raise KeyError(number)
+        slot = (number - 1) % self.capacity
+        return self.formulas[slot], self.exact.get(slot, self.values[slot])
+
+    def __iter__(self):
+        """Yields (number, formula, value) from the oldest entry"""
+        for number in range(max(self.count - self.capacity, 0) + 1, self.count + 1):
+            yield (number,) + self[number]
+
+
+class Session:
+    """History of results and user variables of one calculator session
+
+    Formulas may use 'ans' for the last result, 'ansN' for N-th result and variables
+    defined by 'name = formula'. Changing a variable re-evaluates only variables which
+    depend on it. History and variables are saved to disk and loaded on first use.
+    """
+
+    def __init__(self, path=None, capacity=None, backend=None):
+        """
+        :param path: - prefix of history and variables files, None keeps session in memory
+        :param capacity: - number of remembered results, config.ini value by default
+        :param backend: - name of number backend, see calc.backends.BACKENDS
+        """
+        self.path = path
+        self.capacity = int(conf.get('session_params', 'history_size', fallback='1000')) if capacity is None \
+            else capacity
+        self.backend = get_backend(backend)
+        self.codes = LRUCache(int(conf.get('calc_params', 'cache_size', fallback='256')))
+        # compiled subexpressions of formulas being typed, see Session.preview
+        self.memo = LRUCache(int(conf.get('calc_params', 'cache_size', fallback='256')) * 4)
+        self._history = None
+        self._variables = None  # name -> [formula, compiled code, value]
+        self._dependents = None  # name -> names of variables using it
+
+    @property
+    def history(self):
+        if self._history is None:
+            self._load()
+        return self._history
+
+    @property
+    def variables(self):
+        if self._variables is None:
+            self._load()
+        return {name: variable[2] for name, variable in self._variables.items()}
+
+    def evaluate(self, text, func=None):
+        """Evaluates formula or assignment 'name = formula' and remembers result
+        :param func: - None, bin or hex output formatting
+        :return: - formatted result
+        """
+        if text == '':
+            return 0
+        match = _assignment.match(text)
+        if match:
+            name, formula = match.group(1), match.group(2).strip()
+            self.define(name, formula)
+            value = self._variables[name][2]
+        else:
+            value = self._run(self._compile(text))
+            self.history.push(text, value)
+            self._append(text, value)
+        return format_result(value, func, self.backend)
+
+    def define(self, name, formula):
+        """Defines variable and re-evaluates variables depending on it
+        :return: - names of re-evaluated variables in order of evaluation
+        """
+        if self._variables is None:
+            self._load()
+        if name == 'ans' or _history_ref.match(name) or name in self.backend.names:
+            raise InvalidInputError(f"invalid input: {name} can't be a variable name")
+        # 'ans' changes with every evaluation, variable keeps the result it meant
+        formula = _ans.sub(f'ans{self.history.count}', formula)
+        code = self._compile(formula)
+        if name in self._closure(code.variables):
+            raise InvalidInputError(f"invalid input: {name} depends on itself")
+        # new values are computed aside, session changes only if the variable and all its dependents succeed
+        scratch = {name: self._run(code)}
+        updated = self._dependency_order(name)
+        for dependent in updated:
+            scratch[dependent] = self._run(self._variables[dependent][1], scratch)
+
+        old = self._variables.get(name)
+        if old is not None:
+            for used in old[1].variables:
+                self._dependents.get(used, set()).discard(name)
+        for used in code.variables:
+            self._dependents.setdefault(used, set()).add(name)
+        self._variables[name] = [formula, code, scratch[name]]
+        for dependent in updated:
+            self._variables[dependent][2] = scratch[dependent]
+        self._save_variables()
+        return updated
+
+    def preview(self, text, func=None):
+        """Evaluates formula or right part of assignment being typed, no result is remembered.
+        Compiled subexpressions are, so every keystroke compiles only the changed part of the formula
+        :param func: - None, bin or hex output formatting
+        :return: - formatted result, or None if formula is incomplete or can't be evaluated
+        """
+        match = _assignment.match(text)
+        formula = match.group(2).strip() if match else text
+        if formula == '':
+            return None
+        try:
+            # not in codes, every keystroke would push a useful entry out of the cache
+            code = compile_source(formula, self.backend, variables=None, memo=self.memo)
+            return format_result(self._run(code), func, self.backend)
+        except BaseConversionError as error:
+            return error.value
+        except CalcError:
+            return None
+
+    def _closure(self, names):
+        """Returns names together with everything they depend on"""
+        seen = set()
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name not in seen:
+                seen.add(name)
+                if name in self._variables:
+                    stack.extend(self._variables[name][1].variables)
+        return seen
+
+    def _dependency_order(self, name):
+        """Returns variables depending on name, each after everything it depends on"""
+        order = []
+        visited = set()
+
+        def visit(current):
+            for dependent in self._dependents.get(current, ()):
+                if dependent not in visited:
+                    visited.add(dependent)
+                    visit(dependent)
+                    order.append(dependent)
+
+        visit(name)
+        return order[::-1]
+
+    def _compile(self, formula):
+        code = self.codes.get(formula)
+        if code is None:
+            code = compile_source(formula, self.backend, variables=None)
+            self.codes.put(formula, code)
+        return code
+
+    def _run(self, code, scratch=None):
+        """Evaluates code with session values, values in scratch take precedence"""
+        env = {}
+        for name in code.variables:
+            env[name] = scratch[name] if scratch is not None and name in scratch else self._resolve(name)
+        return run_compiled(code, self.backend, env)
+
+    def _resolve(self, name):
+        if self._variables is None:
+            self._load()
+        if name in self._variables:
+            return self._variables[name][2]
+        number = self.history.count if name == 'ans' else None
+        match = _history_ref.match(name)
+        if match:
+            number = int(match.group(1))
+        if number is not None:
+            if number not in self.history:
+                raise InvalidInputError(f"invalid input: there is no result {name}")
+            return self.history[number][1]
+        raise InvalidInputError(f"invalid input: unknown name {name}")
+
+    def _load(self):
+        self._history = HistoryRing(self.capacity)
+        self._variables = {}
+        self._dependents = {}
+        if self.path is None:
+            return
+        for line in _tail_lines(self.path + '.history', self.capacity):
+            record = json.loads(line)
+            self._history.count = record['n'] - 1
+            self._history.push(record['f'], _load_value(record['v']))
+        if os.path.exists(self.path + '.variables'):
+            with open(self.path + '.variables', encoding='utf-8') as file:
+                self._load_variables(json.load(file))
+
+    def _load_variables(self, definitions):
+        codes = {}
+        for name, formula in definitions:
+            try:
+                codes[name] = (formula, self._compile(formula))
+            except InvalidInputError:
+                continue
+
+        def load(name, path):
+            # variables it depends on are loaded first, broken definitions are skipped
+            if name in self._variables or name not in codes or name in path:
+                return
+            formula, code = codes[name]
+            for used in code.variables:
+                load(used, path + (name,))
+            try:
+                self._variables[name] = [formula, code, self._run(code)]
+            except CalcError:
+                return
+            for used in code.variables:
+                self._dependents.setdefault(used, set()).add(name)
+
+        for name in codes:
+            load(name, ())
+
+    def _append(self, formula, value):
+        if self.path is not None:
+            with open(self.path + '.history', 'a', encoding='utf-8') as file:
+                file.write(json.dumps({'n': self.history.count, 'f': formula, 'v': _dump_value(value)}) + '\n')
+
+    def _save_variables(self):
+        if self.path is not None:
+            with open(self.path + '.variables', 'w', encoding='utf-8') as file:
+                json.dump([[name, variable[0]] for name, variable in self._variables.items()], file)
+
+
+def _dump_value(value):
+    if type(value) is int and value.bit_length() >= 10000:
+        return ['int', hex(value)]  # hex has no length limit of str conversion
+    if type(value) in (int, float):
+        return value
+    return [type(value).__name__, str(value)]
+
+
+def _load_value(value):
+    if not isinstance(value, list):
+        return value
+    kind, text = value
+    if kind == 'int':
+        return int(text, 16)
+    if kind == 'Decimal':
+        return Decimal(text)
+    if kind == 'Fraction':
+        return Fraction(text)
+    import mpmath
+    return mpmath.mpf(text)
+
+
+def _tail_lines(path, count, chunk=65536):
+    """Returns last count lines of the file reading it from the end, so huge histories load fast"""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        position = file.tell()
+        data = b''
+        while position > 0 and data.count(b'\n') <= count:
+            step = min(chunk, position)
+            position -= step
+            file.seek(position)
+            data = file.read(step) + data
+    lines = data.decode('utf-8').splitlines()
+    if position > 0:
+        lines = lines[1:]  # first line may be cut in the middle
+    return [line for line in lines[-count:] if line]
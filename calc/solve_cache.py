@@ -0,0 +1,124 @@
+import ast
+import json
+import os
+import time
+from calc.cache import LRUCache
+
+
+def _dump(solution):
+    """Returns text of solution, JSON for numeric roots, sympy srepr for anything else"""
+    if isinstance(solution, list) and all(type(value) in (float, complex) for value in solution):
+        return json.dumps(['numeric', [[value.real, value.imag] if type(value) is complex else value
+                                       for value in solution]])
+    from sympy import srepr
+    return json.dumps(['sympy', srepr(solution)])
+
+
+def _load(text):
+    """Rebuilds solution from _dump text
+    :raise ValueError: - if text is not a valid solution
+    """
+    kind, value = json.loads(text)
+    if kind == 'numeric':
+        return [complex(*root) if isinstance(root, list) else float(root) for root in value]
+    if kind == 'sympy':
+        return _build(ast.parse(value, mode='eval').body)
+    raise ValueError(f"unknown solution kind {kind!r}")
+
+
+def _build(node):
+    """Evaluates srepr tree allowing only sympy classes, their singletons and literals, the file is not trusted"""
+    import sympy
+    from sympy import Basic
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float, str, bool):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return -_build(node.operand)
+    if isinstance(node, (ast.List, ast.Tuple)):
+        items = [_build(item) for item in node.elts]
+        return items if isinstance(node, ast.List) else tuple(items)
+    if isinstance(node, ast.Dict) and None not in node.keys:
+        return {_build(key): _build(value) for key, value in zip(node.keys, node.values)}
+    if isinstance(node, ast.Name):
+        value = getattr(sympy, node.id, None)
+        if isinstance(value, Basic):
+            return value  # e.g. I, pi, oo
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        cls = getattr(sympy, node.func.id, None)
+        if isinstance(cls, type) and issubclass(cls, Basic) and None not in (kw.arg for kw in node.keywords):
+            return cls(*[_build(arg) for arg in node.args], **{kw.arg: _build(kw.value) for kw in node.keywords})
+    raise ValueError(f"invalid solution: {ast.unparse(node)}")
+
+
+class SolveCache:
+    """Persistent cache of equation solutions
+
+    Solutions are stored in sqlite file keyed by canonical form of the equation and
+    evicted by last use time when there are more than max_entries of them. They are stored as
+    text, not pickled, and rebuilt without eval, so the file can't run code when it is read.
+    Recently used solutions are also kept in memory keyed by the raw equation string.
+    """
+
+    def __init__(self, path, max_entries, memory_size):
+        """
+        :param path: - path of sqlite file, None keeps solutions in memory only
+        :param max_entries: - maximum number of solutions in the file
+        :param memory_size: - maximum number of solutions in memory
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.memory = LRUCache(memory_size)
+        self._db = None
+        self._pid = None
+
+    def _connect(self):
+        # connection can't be shared with processes forked after it was opened
+        if self._db is None or self._pid != os.getpid():
+            import sqlite3
+            self._db = sqlite3.connect(self.path, timeout=5)
+            self._db.execute('CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, value BLOB, used REAL)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS solutions_used ON solutions (used)')
+            self._pid = os.getpid()
+        return self._db
+
+    def get_raw(self, raw):
+        """Returns solution of the equation as typed or None, memory only"""
+        return self.memory.get(raw)
+
+    def get(self, raw, key):
+        """Returns solution by canonical key or None, found solution is remembered for raw equation
+        :param raw: - equation as typed
+        :param key: - canonical form of the equation
+        """
+        if self.path is None:
+            return None
+        db = self._connect()
+        row = db.execute('SELECT value FROM solutions WHERE key = ?', (key,)).fetchone()
+        if row is None or not isinstance(row[0], str):
+            return None  # BLOB rows are pickles of older versions, they are replaced by put
+        try:
+            solution = _load(row[0])
+        except (ValueError, TypeError, SyntaxError, RecursionError):
+            return None
+        with db:
+            db.execute('UPDATE solutions SET used = ? WHERE key = ?', (time.time(), key))
+        self.memory.put(raw, solution)
+        return solution
+
+    def put(self, raw, key, solution):
+        self.memory.put(raw, solution)
+        if self.path is None:
+            return
+        db = self._connect()
+        with db:
+            db.execute('INSERT OR REPLACE INTO solutions VALUES (?, ?, ?)',
+                       (key, _dump(solution), time.time()))
+            db.execute('DELETE FROM solutions WHERE key IN '
+                       '(SELECT key FROM solutions ORDER BY used DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def clear(self):
+        self.memory.clear()
+        if self.path is not None:
+            db = self._connect()
+            with db:
+                db.execute('DELETE FROM solutions')
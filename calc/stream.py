@@ -0,0 +1,100 @@
+"""Evaluation of files of formulas, one per line, of any size
+
+Input is memory-mapped and cut into blocks of whole lines, which are evaluated by a pool
+of processes. Only a bounded window of blocks is in flight, results are written in the
+order of input, so memory doesn't depend on the size of the file.
+"""
+import mmap
+import multiprocessing
+import os
+from collections import deque
+from calc.calc import iter_evaluate
+
+# bytes of input in one block sent to a worker
+BLOCK_SIZE = 1 << 20
+
+
+def iter_blocks(path, block_size=BLOCK_SIZE):
+    """Yields (lines, end offset) of memory-mapped file, every block ends with a whole line"""
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            size = len(data)
+            position = 0
+            while position < size:
+                end = data.find(b'\n', min(position + block_size, size) - 1)
+                end = size if end == -1 else end + 1
+                # only \n ends a line, as in line iteration of the command line, splitlines() would also
+                # split on \x0b, \x0c, \x1c-\x1e, \x85 and \u2028 and shift results against input lines
+                lines = data[position:end].decode('utf-8').split('\n')
+                if lines[-1] == '':
+                    lines.pop()
+                yield [line[:-1] if line.endswith('\r') else line for line in lines], end
+                position = end
+
+
+def iter_lines(path):
+    """Lazily yields stripped lines of the file"""
+    for lines, _ in iter_blocks(path):
+        for line in lines:
+            yield line.strip()
+
+
+def evaluate_block(lines, base=None, backend=None):
+    """Returns text of results of the lines, 'error: <message>' for failed ones, and number of errors"""
+    out = []
+    errors = 0
+    for result in iter_evaluate((line.strip() for line in lines), base, backend):
+        if result.error is None:
+            out.append(f"{result.value}\n")
+        else:
+            errors += 1
+            out.append(f"error: {result.error}\n")
+    return ''.join(out), errors
+
+
+def evaluate_file(source, target, base=None, backend=None, processes=None, block_size=BLOCK_SIZE,
+                  progress=None, cancel=None):
+    """Evaluates every line of source file and writes results line by line to target file
+    :param base: - None, bin or hex output formatting
+    :param backend: - name of number backend, see calc.backends.BACKENDS
+    :param processes: - worker processes, number of cores by default, 1 evaluates in this process
+    :param progress: - called with processed and total bytes after every block
+    :param cancel: - threading.Event, evaluation stops when it is set
+    :return: - (number of lines, number of errors)
+    """
+    processes = processes or os.cpu_count() or 1
+    total = os.path.getsize(source)
+    lines = errors = 0
+    with open(target, 'w', encoding='utf-8', buffering=BLOCK_SIZE) as out:
+        def write(text, block_errors, count, end):
+            nonlocal lines, errors
+            out.write(text)
+            lines += count
+            errors += block_errors
+            if progress is not None:
+                progress(end, total)
+
+        if processes == 1:
+            for block, end in iter_blocks(source, block_size):
+                if cancel is not None and cancel.is_set():
+                    break
+                write(*evaluate_block(block, base, backend), len(block), end)
+            return lines, errors
+
+        # spawn doesn't copy GUI state of parent process into workers
+        with multiprocessing.get_context('spawn').Pool(processes) as pool:
+            window = deque()
+            for block, end in iter_blocks(source, block_size):
+                if cancel is not None and cancel.is_set():
+                    break
+                window.append((pool.apply_async(evaluate_block, (block, base, backend)), len(block), end))
+                # blocks in flight are bounded, so reading never runs far ahead of writing
+                if len(window) >= 2 * processes:
+                    result, count, block_end = window.popleft()
+                    write(*result.get(), count, block_end)
+            while window and not (cancel is not None and cancel.is_set()):
+                result, count, block_end = window.popleft()
+                write(*result.get(), count, block_end)
+    return lines, errors
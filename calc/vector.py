@@ -0,0 +1,43 @@
+import numpy as np
+from calc.cache import LRUCache
+from calc.compiler import compile_expr
+from calc.calc import normalize
+from config.config import conf
+
+# numpy counterparts of the math functions available in calc.evaluate
+NUMPY_NAMES = {
+    'sqrt': np.sqrt,
+    'sin': np.sin,
+    'cos': np.cos,
+    'log': np.log,
+    'fabs': np.fabs,
+    'pi': np.pi,
+    'e': np.e,
+}
+
+_code_cache = LRUCache(int(conf.get('calc_params', 'cache_size', fallback='256')))
+
+
+def compile_array(formula):
+    """Returns compiled Expression of the formula with free variables
+    :param formula: - formula as typed by user, e.g. 'sin(x)*y^2'
+    """
+    code = _code_cache.get(formula)
+    if code is None:
+        code = compile_expr(normalize(formula), NUMPY_NAMES)
+        _code_cache.put(formula, code)
+    return code
+
+
+def evaluate_array(formula, **variables):
+    """Evaluates one formula over arrays of variable values in a single vectorized pass
+    :param formula: - formula as typed by user, e.g. 'sin(x)*y^2'
+    :param variables: - values of free variables, arrays are broadcast against each other
+    :return: - numpy array of results
+    """
+    code = compile_array(formula)
+    unknown = code.variables - variables.keys()
+    if unknown:
+        raise ValueError(f"unknown names: {', '.join(sorted(unknown))}")
+    env = {name: np.asarray(value) for name, value in variables.items()}
+    return np.asarray(code.evaluate(env))
@@ -1,6 +1,7 @@
 from configparser import ConfigParser
-from os.path import abspath
+from os.path import abspath, dirname, join
 
-conf = ConfigParser()
-conf.read('config.ini')
+root_dir = dirname(dirname(abspath(__file__)))
 
+conf = ConfigParser()
+conf.read(join(root_dir, 'config.ini'))
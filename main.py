@@ -1,6 +1,15 @@
+import logging
+import os
+import sys
+import threading
+import time
+from time import perf_counter
 import wx
-from config.config import conf
-from modes.modes import CalcMode, EquationsMode
+from calc import metrics
+from calc.errors import CalcError
+from config.config import conf, root_dir
+from modes.debug import DebugFrame
+from modes.modes import CalcMode, EquationsMode, FunctionsMode
 # from modes.equations import EquationsMode
 
 
@@ -11,14 +20,46 @@ class MainFrame(wx.Frame):
 
         self.panel = wx.Panel(self)  # main panel
         self.main_box = wx.BoxSizer(wx.VERTICAL)  # main sizer
-        CalcMode(self.panel, self.main_box)
+        self.panel.SetSizer(self.main_box)
+        self.modes = {}  # mode class -> (mode panel, mode), every mode is built once
+        self.switch_hook = None  # called with mode name and seconds spent on switching to it
+        self.debug_frame = None
+        self.switch_mode(CalcMode)
         self.create_menu()  # creating menu bar. ToDo - why I shall create it after all inner content ?
+        self.create_metrics_sink()
+
+        # hidden debug panel with live metrics
+        debug_id = wx.NewIdRef()
+        self.Bind(wx.EVT_MENU, self.on_debug, id=debug_id)
+        self.SetAcceleratorTable(wx.AcceleratorTable([(wx.ACCEL_CTRL | wx.ACCEL_SHIFT, ord('D'), debug_id)]))
+
+    def switch_mode(self, mode_class):
+        start = perf_counter()
+        if mode_class not in self.modes:
+            # every mode has own panel, so hiding it keeps widgets and I/O state
+            panel = wx.Panel(self.panel)
+            self.modes[mode_class] = (panel, mode_class(panel, wx.BoxSizer(wx.VERTICAL)))
+            self.main_box.Add(panel)
+        for cls, (panel, mode) in self.modes.items():
+            panel.Show(cls is mode_class)
+        self.main_box.Layout()
+        self.report_switch(mode_class.__name__, perf_counter() - start)
+
+    def report_switch(self, name, seconds):
+        logging.getLogger(__name__).debug("switched to %s in %.2f ms", name, seconds * 1000)
+        if metrics.ENABLED:
+            metrics.observe('switch.' + name, seconds)
+        if self.switch_hook is not None:
+            self.switch_hook(name, seconds)
 
     def equation_mode(self, event):
-        EquationsMode(self.panel, self.main_box)
+        self.switch_mode(EquationsMode)
 
     def calc_mode(self, event):
-        CalcMode(self.panel, self.main_box)
+        self.switch_mode(CalcMode)
+
+    def functions_mode(self, event):
+        self.switch_mode(FunctionsMode)
 
     def create_menu(self):
         menu_bar = wx.MenuBar()  # row under the top border of application
@@ -29,6 +70,8 @@ class MainFrame(wx.Frame):
         # forming file section
         about_item = file_section.Append(wx.ID_ABOUT)
         # ToDo - create action for ABOUT
+        evaluate_item = file_section.Append(-1, '&Evaluate file...')
+        self.Bind(wx.EVT_MENU, self.on_evaluate_file, evaluate_item)
         file_section.AppendSeparator()
         exit_item = file_section.Append(wx.ID_EXIT)
         self.Bind(wx.EVT_MENU, self.on_exit, exit_item)
@@ -38,18 +81,108 @@ class MainFrame(wx.Frame):
         self.Bind(wx.EVT_MENU, self.calc_mode, calc_item)
         equation_item = mode_section.AppendRadioItem(-1, '&Equations')
         self.Bind(wx.EVT_MENU, self.equation_mode, equation_item)
-        functions = mode_section.AppendRadioItem(-1, '&Functions')
-        # ToDo - create action for radio buttons
+        functions_item = mode_section.AppendRadioItem(-1, '&Functions')
+        self.Bind(wx.EVT_MENU, self.functions_mode, functions_item)
         mode_section.AppendSeparator()
 
         menu_bar.Append(file_section, '&File')
         menu_bar.Append(mode_section, '&Mode')
         self.SetMenuBar(menu_bar)
 
+    def create_metrics_sink(self):
+        sink = conf.get('metrics_params', 'sink', fallback='')
+        if sink == 'log':
+            metrics.add_sink(metrics.LogSink())
+        elif sink == 'prometheus':
+            path = conf.get('metrics_params', 'path', fallback='metrics.prom')
+            metrics.add_sink(metrics.PrometheusFileSink(os.path.join(root_dir, path)))
+        else:
+            return
+        self.flush_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, lambda event: metrics.flush(), self.flush_timer)
+        self.flush_timer.Start(int(float(conf.get('metrics_params', 'flush_interval', fallback='10')) * 1000))
+        self.Bind(wx.EVT_CLOSE, self.on_close)
+
+    def on_close(self, event):
+        metrics.flush()
+        event.Skip()
+
+    def on_debug(self, event):
+        if self.debug_frame is None:
+            self.debug_frame = DebugFrame(self)
+        self.debug_frame.toggle()
+
+    def on_evaluate_file(self, event):
+        from calc.stream import evaluate_file
+        with wx.FileDialog(self, "Formulas to evaluate", style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as dialog:
+            if dialog.ShowModal() != wx.ID_OK:
+                return
+            source = dialog.GetPath()
+        with wx.FileDialog(self, "Save results", defaultFile=os.path.basename(source) + '.results',
+                           style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as dialog:
+            if dialog.ShowModal() != wx.ID_OK:
+                return
+            target = dialog.GetPath()
+
+        progress = wx.ProgressDialog("Evaluating", os.path.basename(source), maximum=1000, parent=self,
+                                     style=wx.PD_APP_MODAL | wx.PD_CAN_ABORT | wx.PD_ELAPSED_TIME |
+                                     wx.PD_REMAINING_TIME | wx.PD_AUTO_HIDE)
+        cancel = threading.Event()
+
+        def on_progress(done, total):
+            # runs in worker thread, dialog is updated on GUI thread
+            wx.CallAfter(update, done * 1000 // max(total, 1))
+
+        def update(value):
+            if not cancel.is_set() and not progress.Update(min(value, 999))[0]:
+                cancel.set()
+
+        def run():
+            try:
+                lines, errors = evaluate_file(source, target, progress=on_progress, cancel=cancel)
+                message = f"{lines} lines evaluated, {errors} errors.\nResults are in {target}"
+                if cancel.is_set():
+                    message = f"Cancelled after {lines} lines, {errors} errors."
+            except (OSError, UnicodeDecodeError, CalcError) as error:
+                message = f"Evaluation failed: {error}"
+            wx.CallAfter(done, message)
+
+        def done(message):
+            cancel.set()
+            progress.Destroy()
+            wx.MessageBox(message, "Evaluate file")
+
+        threading.Thread(target=run, daemon=True).start()
+
     def on_exit(self, event):
         self.Close(True)
 
 
+def warm_up():
+    """Imports numpy stack of Equations and Functions modes, so switching to them doesn't wait for it.
+    Sympy is imported by the solving process, see calc.pool
+    """
+    try:
+        import calc.plot  # noqa: F401
+        import calc.ode  # noqa: F401
+    except ImportError as error:
+        logging.getLogger(__name__).warning("warm-up failed: %s", error)
+
+
+def report_first_paint(frame):
+    """Prints wall time of the first paint of the window for benchmarks.startup and closes it"""
+    painted = []
+
+    def on_paint(event):
+        event.Skip()
+        if not painted:
+            painted.append(time.time())
+            print(f"first_paint {painted[0]:.6f}", flush=True)
+            wx.CallAfter(frame.Close, True)
+
+    frame.panel.Bind(wx.EVT_PAINT, on_paint)
+
+
 if __name__ == "__main__":
     app = wx.App()
     frame = MainFrame(None, -1, style=wx.DEFAULT_FRAME_STYLE ^ wx.RESIZE_BORDER,  # making fixed-size frame
@@ -57,5 +190,10 @@ if __name__ == "__main__":
                                                    int(conf.get('window_params', 'max_h'))
                                                    )
                       )
+    if '--startup-report' in sys.argv:
+        report_first_paint(frame)
+    elif conf.get('window_params', 'warm_up', fallback='1') == '1':
+        # heavy modules are loaded after the window is shown instead of before it
+        wx.CallAfter(lambda: threading.Thread(target=warm_up, daemon=True).start())
     frame.Show()
     app.MainLoop()
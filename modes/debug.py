@@ -0,0 +1,69 @@
+import wx
+from calc import metrics
+
+
+class DebugFrame(wx.Frame):
+    """Hidden window with live metrics of calculation stages, opening it enables recording"""
+
+    def __init__(self, parent):
+        super().__init__(parent, title="Debug: metrics", size=(520, 360))
+        metrics.enable()
+        panel = wx.Panel(self)
+        box = wx.BoxSizer(wx.VERTICAL)
+
+        self.stages = wx.ListCtrl(panel, style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
+        for column, (title, width) in enumerate([('stage', 160), ('count', 70), ('p50, ms', 80),
+                                                 ('p99, ms', 80), ('max, ms', 80)]):
+            self.stages.InsertColumn(column, title, width=width)
+        self.counters = wx.TextCtrl(panel, style=wx.TE_MULTILINE | wx.TE_READONLY, size=(-1, 90))
+
+        buttons = wx.BoxSizer(wx.HORIZONTAL)
+        reset = wx.Button(panel, label="Reset")
+        reset.Bind(wx.EVT_BUTTON, self.on_reset)
+        dump = wx.Button(panel, label="Copy Prometheus text")
+        dump.Bind(wx.EVT_BUTTON, self.on_dump)
+        buttons.Add(reset)
+        buttons.Add(dump, wx.SizerFlags().Border(wx.LEFT, 5))
+
+        box.Add(self.stages, wx.SizerFlags(1).Expand().Border(wx.ALL, 5))
+        box.Add(self.counters, wx.SizerFlags().Expand().Border(wx.LEFT | wx.RIGHT, 5))
+        box.Add(buttons, wx.SizerFlags().Border(wx.ALL, 5))
+        panel.SetSizer(box)
+
+        self.timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_timer, self.timer)
+        self.Bind(wx.EVT_CLOSE, self.on_close)
+        self.timer.Start(500)
+        self.on_timer(None)
+
+    def on_timer(self, event):
+        data = metrics.snapshot()
+        self.stages.DeleteAllItems()
+        for name, histogram in sorted(data['histograms'].items()):
+            row = self.stages.GetItemCount()
+            self.stages.InsertItem(row, name)
+            self.stages.SetItem(row, 1, str(histogram['count']))
+            for column, key in enumerate(['p50', 'p99', 'max'], 2):
+                self.stages.SetItem(row, column, f"{histogram[key] * 1000:.3f}")
+        self.counters.SetValue('\n'.join(f"{name}: {value}" for name, value in sorted(data['counters'].items())))
+
+    def on_reset(self, event):
+        metrics.reset()
+        self.on_timer(None)
+
+    def on_dump(self, event):
+        if wx.TheClipboard.Open():
+            wx.TheClipboard.SetData(wx.TextDataObject(metrics.prometheus_text()))
+            wx.TheClipboard.Close()
+
+    def on_close(self, event):
+        # window is only hidden, so it opens again with the same state
+        self.timer.Stop()
+        self.Hide()
+
+    def toggle(self):
+        if self.IsShown():
+            self.on_close(None)
+        else:
+            self.timer.Start(500)
+            self.Show()
@@ -1,6 +1,10 @@
+import os
+from time import perf_counter
 import wx
-from calc import calc
-from config.config import conf
+from calc import calc, intengine, metrics
+from calc.errors import CalcError, BaseConversionError
+from calc.session import Session
+from config.config import conf, root_dir
 from abc import ABC, abstractmethod
 
 
@@ -47,7 +51,7 @@ class BaseMode:
         self.input = None
         self.output = None
         self.clear_input_if_checked = None
-        main_box.Clear(True)
+        self.func_buttons = []  # float function buttons, disabled where they don't apply
 
     def load_o_to_i(self, event):
         self.input.SetValue(self.output.GetValue())
@@ -77,6 +81,7 @@ class BaseMode:
             font.PointSize += 5
             b.SetFont(font)
             rxbox[i].Add(b)
+            self.func_buttons.append(b)
 
         return bbox, rxbox
 
@@ -91,10 +96,16 @@ class CalcMode(AbstractMode, BaseMode):
         self.input_type = 0
         self.default_input = ''
         self.output_type = 0
+        self.live = None
+        self.word_size = None
+        self.signed = None
+        self.preview_generation = 0  # previews of older input are discarded
+        session_path = conf.get('session_params', 'path', fallback='')
+        self.session = Session(os.path.join(root_dir, session_path) if session_path else None)
 
         self.gui_box = wx.BoxSizer(wx.HORIZONTAL)  # GUI handler
         options_box = wx.BoxSizer(wx.HORIZONTAL)  # option box above left and right GUI
-        left_box = wx.BoxSizer(wx.VERTICAL)  # left part of the GUI
+        self.left_box = wx.BoxSizer(wx.VERTICAL)  # left part of the GUI
         right_box = wx.BoxSizer(wx.VERTICAL)  # right part of the GUI
 
         obox = self.calc_options_buttons(panel)  # options
@@ -105,10 +116,19 @@ class CalcMode(AbstractMode, BaseMode):
         right_box.Add(lbox)  # I/O should be from right
         right_box.Add(fbox, wx.SizerFlags().Border(wx.TOP, 5))  # functions should be under I/O
 
-        bbox = self.num_buttons(panel)  # number buttons
-        left_box.Add(bbox)  # numbers should be from left
+        # bin and hex input is evaluated by integer engine with word options above the pad
+        self.word_box = self.word_options(panel)
+        self.left_box.Add(self.word_box, wx.SizerFlags().Border(wx.BOTTOM, 5))
+        self.left_box.Show(self.word_box, self.input_type != 0)
 
-        self.gui_box.Add(left_box, wx.SizerFlags().Border(wx.LEFT, 10))
+        # number buttons of dec, bin and hex input are built once, only one of them is shown
+        self.pads = [self.num_buttons(panel), self.bin_num_buttons(panel), self.hex_buttons(panel)]
+        for pad in self.pads:
+            self.left_box.Add(pad)  # numbers should be from left
+            self.left_box.Hide(pad)
+        self.left_box.Show(self.pads[self.input_type])
+
+        self.gui_box.Add(self.left_box, wx.SizerFlags().Border(wx.LEFT, 10))
         self.gui_box.Add(right_box, wx.SizerFlags().Border(wx.LEFT, 10))
 
         main_box.Add(options_box, wx.SizerFlags().Border(wx.LEFT | wx.TOP, 10))
@@ -135,13 +155,34 @@ class CalcMode(AbstractMode, BaseMode):
         font.PointSize = 15
         self.output.SetFont(font)
 
-        # input event handler
+        # input event handlers
         self.input.Bind(wx.EVT_TEXT_ENTER, self.on_enter)
+        self.input.Bind(wx.EVT_TEXT, self.on_text)
         # I/O sizers
         lbox.Add(self.input)
         lbox.Add(self.output, wx.SizerFlags().Border(wx.TOP, 5))
         return lbox
 
+    def word_options(self, panel):
+        hbox = wx.BoxSizer(wx.HORIZONTAL)
+        word_sizes = ['8', '16', '32', '64', 'any']
+        self.word_size = wx.Choice(panel, choices=word_sizes)
+        word = conf.get('int_params', 'word_size', fallback='64')
+        self.word_size.SetSelection(word_sizes.index(word) if word in word_sizes else 3)
+        self.signed = wx.CheckBox(panel, label='Signed')
+        self.signed.SetValue(conf.get('int_params', 'signed', fallback='1') == '1')
+        hbox.Add(wx.StaticText(panel, label='Word'), wx.SizerFlags().Center())
+        hbox.Add(self.word_size, wx.SizerFlags().Border(wx.LEFT, 5))
+        hbox.Add(self.signed, wx.SizerFlags().Center().Border(wx.LEFT, 10))
+        return hbox
+
+    def evaluate(self, text, base):
+        """Evaluates dec input in the session, bin and hex input by integer engine"""
+        if self.input_type == 0:
+            return self.session.evaluate(text, base)
+        word = self.word_size.GetString(self.word_size.GetSelection())
+        return intengine.evaluate(text, base, None if word == 'any' else int(word), self.signed.GetValue())
+
     def bin_num_buttons(self, panel):
         bbox = wx.BoxSizer(wx.VERTICAL)
         rxbox = []
@@ -156,13 +197,16 @@ class CalcMode(AbstractMode, BaseMode):
                                                             )
                           )
             b.Bind(wx.EVT_BUTTON, self.on_button_click)
+            if labels[i - 1] == '^':
+                # in bin and hex input '^' is xor like in C, power is '**'
+                b.SetToolTip("xor, bitwise exclusive or (power is **)")
             font = b.GetFont()
             font.PointSize += 5
             b.SetFont(font)
             rxbox[i - 1].Add(b)
 
         sizers = [0, 0, 1, 1, 1, 2, 2, 2]
-        for i in ('1', '(/)', '-', '|', '&&', '<<', '>>'):
+        for i in ('1', '(/)', '-', '**', '|', '&&', '<<', '>>'):
             if i == '(/)':
                 b = wx.Choice(panel, name=i, choices=['(', ')'], size=(int(conf.get('button_params', 'w')),
                                                                        int(conf.get('button_params', 'h')))
@@ -173,6 +217,8 @@ class CalcMode(AbstractMode, BaseMode):
                                                     int(conf.get('button_params', 'h')))
                               )
                 b.Bind(wx.EVT_BUTTON, self.on_button_click)
+                if i == '**':
+                    b.SetToolTip("power")
             font = b.GetFont()
             font.PointSize += 5
             b.SetFont(font)
@@ -300,14 +346,18 @@ class CalcMode(AbstractMode, BaseMode):
         font.PointSize += 5
         delete.SetFont(font)
 
-        self.clear_input_if_checked = wx.CheckBox(panel, label='\nClear on Enter', size=(100, 40))
+        checks = wx.BoxSizer(wx.VERTICAL)
+        self.clear_input_if_checked = wx.CheckBox(panel, label='Clear on Enter', size=(100, 20))
+        self.live = wx.CheckBox(panel, label='Live preview', size=(100, 20))
+        checks.Add(self.clear_input_if_checked)
+        checks.Add(self.live)
 
         hbox.Add(i)
         hbox.Add(o, wx.SizerFlags().Border(wx.LEFT, 10))
         hbox.Add(delete, wx.SizerFlags().Border(wx.LEFT, 10))
         hbox.Add(clear, wx.SizerFlags().Border(wx.LEFT, 10))
         hbox.Add(enter, wx.SizerFlags().Border(wx.LEFT, 10))
-        hbox.Add(self.clear_input_if_checked, wx.SizerFlags().Border(wx.LEFT, 10))
+        hbox.Add(checks, wx.SizerFlags().Border(wx.LEFT, 10))
 
         return hbox
 
@@ -324,6 +374,9 @@ class CalcMode(AbstractMode, BaseMode):
                                                         )
                               )
                 b.Bind(wx.EVT_BUTTON, self.on_button_click)
+                if label == '^':
+                    b.SetToolTip("power in dec input")
+                self.func_buttons.append(b)
             font = b.GetFont()
             font.PointSize += 5
             b.SetFont(font)
@@ -339,47 +392,87 @@ class CalcMode(AbstractMode, BaseMode):
         self.output_type = event.GetSelection()
 
     def set_input_type(self, event):
-        self.destroy_nums(None)
-        choice = event.GetSelection()
-        if choice == 0:
-            self.gui_box.Insert(0, self.num_buttons(self.panel), wx.SizerFlags().Border(wx.LEFT, 10))
-            self.default_input = ''
-        elif choice == 1:
-            self.gui_box.Insert(0, self.bin_num_buttons(self.panel), wx.SizerFlags().Border(wx.LEFT, 10))
-            self.default_input = '0b'
-        else:
-            self.gui_box.Insert(0, self.hex_buttons(self.panel), wx.SizerFlags().Border(wx.LEFT, 10))
-            self.default_input = '0x'
+        self.left_box.Hide(self.pads[self.input_type])
+        self.input_type = event.GetSelection()
+        self.left_box.Show(self.pads[self.input_type])
+        self.left_box.Show(self.word_box, self.input_type != 0)
+        # integer engine has no float functions and its '^' is xor, see the bin pad
+        for button in self.func_buttons:
+            button.Enable(self.input_type == 0)
+        self.default_input = ['', '0b', '0x'][self.input_type]
         self.input.SetValue(self.default_input)
         self.panel.Layout()
 
     def on_button_click(self, event):
         BaseMode.on_button_click(self, event)
-        if event.EventObject.LabelText in ('+', '-', '*', '/', '|', '&', '^', '<<', '>>'):
+        if event.EventObject.LabelText in ('+', '-', '*', '/', '|', '&', '^', '**', '<<', '>>'):
             self.input.AppendText(self.default_input)
 
-    def destroy_nums(self, event):
-        self.gui_box.Children[0].Sizer.Clear(True)
-        self.gui_box.Remove(0)
-
     def on_parenthesis(self, event):
         self.input.AppendText(['(', ')'][event.GetSelection()])
 
     def on_clear(self, event):
         self.input.SetValue(self.default_input)
 
+    @metrics.timed('calc_mode.on_enter')
     def on_enter(self, event):
         text = self.input.GetValue()
         output_type = [None, bin, hex]
         if self.clear_input_if_checked.GetValue():
             self.input.SetValue(self.default_input)
-        self.output.SetValue(str(calc.evaluate(text, output_type[self.output_type])))
+        try:
+            result = self.evaluate(text, output_type[self.output_type])
+        except BaseConversionError as error:
+            wx.MessageBox(f"{error}\nUsing dec instead.")
+            result = error.value
+        except CalcError as error:
+            result = error
+        self.preview_generation += 1
+        self.output.SetValue(str(result))
+
+    def on_text(self, event):
+        self.preview_generation += 1
+        if self.live.GetValue():
+            # evaluation waits for a pause in typing
+            wx.CallLater(int(conf.get('calc_params', 'live_delay_ms', fallback='150')),
+                         self.on_preview, self.preview_generation)
+
+    def on_preview(self, generation):
+        if generation != self.preview_generation:
+            return
+        if self.input_type == 0:
+            # session namespace, so ans and user variables are previewed too
+            result = self.session.preview(self.input.GetValue(), [None, bin, hex][self.output_type])
+        else:
+            try:
+                result = self.evaluate(self.input.GetValue(), [None, bin, hex][self.output_type])
+            except CalcError:
+                result = None
+        if result is not None:
+            self.output.SetValue(str(result))
 
 
 class EquationsMode(AbstractMode, BaseMode):
+    solver = None  # worker process shared by all instances of the mode
 
     def __init__(self, panel, main_box):
         super().__init__(main_box)
+        if EquationsMode.solver is None:
+            from calc.pool import SolvePool  # multiprocessing is loaded when the mode is opened first
+            EquationsMode.solver = SolvePool(dispatch=wx.CallAfter)
+            EquationsMode.solver.start()
+        self.ticket = None
+        self.text = ''
+        self.equation_type = 0
+        self.numeric_solve = False
+        self.submitted = None  # time of submission of current solve, solving process has own metrics
+        self.fallback = None
+        self.numeric = None
+        self.exact = None
+        self.busy = None
+        self.cancel = None
+        self.busy_timer = wx.Timer(panel)
+        panel.Bind(wx.EVT_TIMER, self.on_busy_timer, self.busy_timer)
 
         gui_box = wx.BoxSizer(wx.VERTICAL)  # GUI handler
         i_o_box = wx.BoxSizer(wx.VERTICAL)  # left part of the GUI
@@ -400,8 +493,18 @@ class EquationsMode(AbstractMode, BaseMode):
     def i_o_labels(self, panel):
         ibox = wx.BoxSizer(wx.HORIZONTAL)
         lbox = wx.BoxSizer(wx.VERTICAL)
+        tbox = wx.BoxSizer(wx.HORIZONTAL)
         types = wx.RadioBox(panel, label="Type of equation", choices=('Linear', 'Diff'))
-        # ToDo - actions for types radiobox
+        types.Bind(wx.EVT_RADIOBOX, self.set_equation_type)
+        self.numeric = wx.CheckBox(panel, label='Numeric')
+        # systems of linear equations, separated by ';', are solved exactly on request only
+        self.exact = wx.CheckBox(panel, label='Exact')
+        load = wx.Button(panel, label="Load system...")
+        load.Bind(wx.EVT_BUTTON, self.on_load_system)
+        tbox.Add(types)
+        tbox.Add(self.numeric, wx.SizerFlags().Center().Border(wx.LEFT, 10))
+        tbox.Add(self.exact, wx.SizerFlags().Center().Border(wx.LEFT, 10))
+        tbox.Add(load, wx.SizerFlags().Center().Border(wx.LEFT, 10))
 
         # I/O definitions
         self.input = wx.TextCtrl(panel, style=wx.TE_PROCESS_ENTER, size=(int(conf.get('equ_label_params', 'w')),
@@ -426,19 +529,122 @@ class EquationsMode(AbstractMode, BaseMode):
         font.PointSize = 15
         self.output.SetFont(font)
 
-        lbox.Add(types)
+        # busy indicator and cancel button of running solve
+        sbox = wx.BoxSizer(wx.HORIZONTAL)
+        self.busy = wx.Gauge(panel, size=(int(conf.get('equ_label_params', 'w')), 15))
+        self.busy.Hide()
+        self.cancel = wx.Button(panel, label="Cancel")
+        self.cancel.Bind(wx.EVT_BUTTON, self.on_cancel)
+        self.cancel.Disable()
+        sbox.Add(self.busy, wx.SizerFlags().Center())
+        sbox.Add(self.cancel, wx.SizerFlags().Border(wx.LEFT, 5))
+
+        lbox.Add(tbox)
         ibox.Add(self.input)
         ibox.Add(text)
         lbox.Add(ibox, wx.SizerFlags().Border(wx.TOP, 5))
         lbox.Add(self.output, wx.SizerFlags().Border(wx.TOP, 5))
+        lbox.Add(sbox, wx.SizerFlags().Border(wx.TOP, 5))
         return lbox
 
     def on_button_click(self, event):
         BaseMode.on_button_click(self, event)
 
+    def set_equation_type(self, event):
+        self.equation_type = event.GetSelection()
+
+    @metrics.timed('equations_mode.on_enter')
     def on_enter(self, event):
-        text = self.input.GetValue()
-        self.output.SetValue(str(calc.solve_equation(text)))
+        self.text = self.input.GetValue()
+        if self.equation_type == 0 and (';' in self.text or '=' in self.text):
+            from calc import linear
+            self.solve(linear.solve, args=(self.text, self.exact.GetValue()))
+            return
+        if self.equation_type == 0:
+            symbolic, numeric = calc.solve_equation, calc.solve_numeric
+        else:
+            from calc import ode  # numpy stack is loaded on first use, see warm_up in main.py
+            symbolic, numeric = ode.solve_symbolic, ode.solve_numeric
+        if self.numeric.GetValue():
+            self.solve(numeric)
+        else:
+            self.solve(symbolic, fallback=numeric)
+            # symbolic solve which takes too long is replaced by numeric one
+            wx.CallLater(int(float(conf.get('equ_params', 'numeric_budget', fallback='2')) * 1000),
+                         self.on_budget, self.ticket)
+
+    def solve(self, func, fallback=None, args=None):
+        # new submission supersedes solve which is still running
+        self.numeric_solve = func is calc.solve_numeric
+        self.fallback = fallback
+        self.ticket = self.solver.submit(func, args or (self.text,), self.on_solved, self.on_failed)
+        self.submitted = perf_counter()
+        wx.CallLater(int(float(conf.get('equ_params', 'solve_timeout', fallback='30')) * 1000),
+                     self.on_timeout, self.ticket)
+        self.set_busy(True)
+
+    def on_load_system(self, event):
+        with wx.FileDialog(self.input.GetParent(), "System of linear equations, one per line",
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as dialog:
+            if dialog.ShowModal() != wx.ID_OK:
+                return
+            path = dialog.GetPath()
+        from calc import linear
+        self.solve(linear.solve_file, args=(path, self.exact.GetValue()))
+
+    def on_budget(self, ticket):
+        if self.output and self.solver.is_current(ticket) and self.fallback is not None:
+            self.solve(self.fallback)
+
+    def on_solved(self, solution):
+        if not self.output:  # mode could be switched while solving
+            return
+        if solution == [] and self.fallback is not None:
+            self.solve(self.fallback)
+            return
+        if metrics.ENABLED:
+            metrics.observe('equations_mode.solve', perf_counter() - self.submitted)
+        self.set_busy(False)
+        if self.numeric_solve:
+            solution = '\u2248 ' + ', '.join(f'{root:.10g}' for root in solution) if solution else 'no real roots found'
+        self.output.SetValue(str(solution))
+
+    def on_failed(self, error):
+        if not self.output:
+            return
+        if isinstance(error, NotImplementedError) and self.fallback is not None:
+            self.solve(self.fallback)
+            return
+        if metrics.ENABLED:
+            metrics.inc('equations_mode.solve.errors')
+        self.set_busy(False)
+        self.output.SetValue(f"error: {error}")
+
+    def on_timeout(self, ticket):
+        if self.output and self.solver.is_current(ticket):
+            self.solver.cancel()
+            self.set_busy(False)
+            self.output.SetValue("timed out")
+
+    def on_cancel(self, event):
+        self.solver.cancel()
+        self.set_busy(False)
+        self.output.SetValue("cancelled")
+
+    def on_busy_timer(self, event):
+        if self.busy:
+            self.busy.Pulse()
+        else:
+            self.busy_timer.Stop()
+
+    def set_busy(self, busy):
+        self.busy.Show(busy)
+        self.cancel.Enable(busy)
+        if busy:
+            self.busy_timer.Start(100)
+        else:
+            self.busy_timer.Stop()
+        self.busy.GetParent().Layout()
 
     def on_clear(self, event):
         self.input.SetValue('')
@@ -462,3 +668,183 @@ class EquationsMode(AbstractMode, BaseMode):
             bbox.Add(row, wx.SizerFlags().Border(wx.TOP, 5))
 
         return bbox
+
+
+class PlotCanvas(wx.Panel):
+    """Plot of y = f(x) drawn with buffered device context, dragging pans and mouse wheel zooms"""
+
+    def __init__(self, parent, size):
+        super().__init__(parent, size=size)
+        self.SetBackgroundStyle(wx.BG_STYLE_PAINT)  # whole background is drawn by on_paint
+        self.sampler = None
+        self.x_range = (-10.0, 10.0)
+        self.y_range = (-10.0, 10.0)
+        self.drag = None
+        self.Bind(wx.EVT_PAINT, self.on_paint)
+        self.Bind(wx.EVT_LEFT_DOWN, self.on_left_down)
+        self.Bind(wx.EVT_LEFT_UP, self.on_left_up)
+        self.Bind(wx.EVT_MOTION, self.on_motion)
+        self.Bind(wx.EVT_MOUSEWHEEL, self.on_wheel)
+
+    def set_function(self, func):
+        from calc.plot import FunctionSampler
+        self.sampler = FunctionSampler(func, int(conf.get('plot_params', 'oversample', fallback='4')),
+                                       int(conf.get('plot_params', 'max_depth', fallback='8')),
+                                       int(conf.get('plot_params', 'max_points', fallback='1000000')))
+        self.Refresh()
+
+    def to_screen(self, x, y):
+        import numpy as np
+        w, h = self.GetClientSize()
+        (x0, x1), (y0, y1) = self.x_range, self.y_range
+        px = (np.asarray(x) - x0) / (x1 - x0) * w
+        py = h - (np.asarray(y) - y0) / (y1 - y0) * h
+        return px, np.clip(py, -h, 2 * h)  # far away points are clipped to keep coordinates in int range
+
+    def on_paint(self, event):
+        import numpy as np
+        dc = wx.BufferedPaintDC(self)
+        dc.SetBackground(wx.WHITE_BRUSH)
+        dc.Clear()
+        w, h = self.GetClientSize()
+        (x0, x1), (y0, y1) = self.x_range, self.y_range
+
+        dc.SetPen(wx.Pen(wx.LIGHT_GREY))
+        ax, ay = self.to_screen(0, 0)
+        if x0 <= 0 <= x1:
+            dc.DrawLine(int(ax), 0, int(ax), h)
+        if y0 <= 0 <= y1:
+            dc.DrawLine(0, int(ay), w, int(ay))
+
+        if self.sampler is None or w < 2:
+            return
+        x, y = self.sampler.samples(x0, x1, w, (y1 - y0) / h)
+        px, py = self.to_screen(x, y)
+        finite = np.isfinite(py)
+        # line is broken at NaN values, e.g. outside of function domain
+        bounds = np.flatnonzero(np.diff(np.concatenate([[False], finite, [False]]).astype(np.int8)))
+        dc.SetPen(wx.Pen(wx.BLUE, 2))
+        for start, end in zip(bounds[::2], bounds[1::2]):
+            if end - start > 1:
+                dc.DrawLines(list(zip(px[start:end].astype(int).tolist(), py[start:end].astype(int).tolist())))
+
+    def on_left_down(self, event):
+        self.drag = (event.GetPosition(), self.x_range, self.y_range)
+        self.CaptureMouse()
+
+    def on_left_up(self, event):
+        if self.HasCapture():
+            self.ReleaseMouse()
+        self.drag = None
+
+    def on_motion(self, event):
+        if self.drag is None or not event.Dragging():
+            return
+        start, (x0, x1), (y0, y1) = self.drag
+        w, h = self.GetClientSize()
+        dx = (event.GetPosition().x - start.x) / w * (x1 - x0)
+        dy = (event.GetPosition().y - start.y) / h * (y1 - y0)
+        self.x_range = (x0 - dx, x1 - dx)
+        self.y_range = (y0 + dy, y1 + dy)
+        self.Refresh()
+
+    def on_wheel(self, event):
+        factor = 0.8 if event.GetWheelRotation() > 0 else 1.25
+        w, h = self.GetClientSize()
+        (x0, x1), (y0, y1) = self.x_range, self.y_range
+        # point under the cursor stays in place
+        cx = x0 + event.GetPosition().x / w * (x1 - x0)
+        cy = y1 - event.GetPosition().y / h * (y1 - y0)
+        self.x_range = (cx - (cx - x0) * factor, cx + (x1 - cx) * factor)
+        self.y_range = (cy - (cy - y0) * factor, cy + (y1 - cy) * factor)
+        self.Refresh()
+
+
+class FunctionsMode(AbstractMode, BaseMode):
+
+    def __init__(self, panel, main_box):
+        super().__init__(main_box)
+
+        gui_box = wx.BoxSizer(wx.VERTICAL)  # GUI handler
+
+        lbox = self.i_o_labels(panel)  # I/O and plot
+        fbox = self.func_button(panel)  # function buttons under the plot
+
+        gui_box.Add(lbox, wx.SizerFlags().Border(wx.LEFT, 10))
+        gui_box.Add(fbox, wx.SizerFlags().Border(wx.LEFT | wx.TOP, 10))
+        main_box.Add(gui_box, wx.SizerFlags().Border(wx.TOP, 10))
+        main_box.Layout()
+        panel.SetSizer(main_box)
+
+    def i_o_labels(self, panel):
+        ibox = wx.BoxSizer(wx.HORIZONTAL)
+        lbox = wx.BoxSizer(wx.VERTICAL)
+
+        text = wx.StaticText(panel, label="y = ")
+        font = text.GetFont()
+        font.PointSize = 20
+        text.SetFont(font)
+
+        # I/O definitions
+        self.input = wx.TextCtrl(panel, style=wx.TE_PROCESS_ENTER, size=(int(conf.get('equ_label_params', 'w')),
+                                                                         int(conf.get('equ_label_params', 'h'))
+                                                                         )
+                                 )
+        font = self.input.GetFont()
+        font.PointSize = 15
+        self.input.SetFont(font)
+        self.input.Bind(wx.EVT_TEXT_ENTER, self.on_enter)
+
+        self.output = wx.TextCtrl(panel, style=wx.TE_READONLY, size=(int(conf.get('plot_params', 'w')), 25))
+        self.canvas = PlotCanvas(panel, size=(int(conf.get('plot_params', 'w')), int(conf.get('plot_params', 'h'))))
+
+        ibox.Add(text)
+        ibox.Add(self.input)
+        lbox.Add(ibox)
+        lbox.Add(self.output, wx.SizerFlags().Border(wx.TOP, 5))
+        lbox.Add(self.canvas, wx.SizerFlags().Border(wx.TOP, 5))
+        return lbox
+
+    def on_button_click(self, event):
+        BaseMode.on_button_click(self, event)
+
+    @metrics.timed('functions_mode.on_enter')
+    def on_enter(self, event):
+        import numpy as np
+        from calc.plot import compile_function
+        text = self.input.GetValue()
+        try:
+            func = compile_function(text)
+            # e.g. 'sin' or 'sin + x' compile, but would fail on every repaint
+            func(np.ones(1))
+        except TypeError:
+            self.output.SetValue("error: formula doesn't give a number, is a function called without argument?")
+            return
+        except (ValueError, ArithmeticError) as error:  # also InvalidInputError
+            self.output.SetValue(f"error: {error}")
+            return
+        self.canvas.set_function(func)
+        self.output.SetValue("drag to pan, scroll to zoom")
+
+    def on_clear(self, event):
+        self.input.SetValue('')
+
+    def func_button(self, panel):
+        bbox, rxbox = BaseMode.func_button(self, panel)
+        sizers = [0, 0, 0, 0, 0, 0, 0, 1, 1]
+        for label in ('cos', '\u221A', 'pi', 'abs', '^', 'e', 'x', '(', ')'):
+            b = wx.Button(panel, label=label, size=(int(conf.get('button_params', 'w')),
+                                                    int(conf.get('button_params', 'h'))
+                                                    )
+                          )
+            b.Bind(wx.EVT_BUTTON, self.on_button_click)
+            font = b.GetFont()
+            font.PointSize += 5
+            b.SetFont(font)
+            rxbox[sizers.pop(0)].Add(b, wx.SizerFlags().Border(wx.LEFT, 5))
+
+        bbox.Add(rxbox.pop(0))
+        for row in rxbox:
+            bbox.Add(row, wx.SizerFlags().Border(wx.TOP, 5))
+
+        return bbox